@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the FrontEnd request paths against a local fake backend.
+
+    python bench/bench_requests.py --requests 500 --concurrency 16 --latency 20 --payload-bytes 5000000
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import (
+    FakePage,
+    LATENCY_HEADER,
+    enter_temp_workdir,
+    format_latency_row,
+    peak_rss_bytes,
+    random_playlist_url,
+    random_video_url,
+    start_fake_backend,
+)
+from fake_backend import add_backend_arguments, options_from_arguments
+
+from FrontEnd import FrontEnd  # noqa: E402
+
+UPLOAD_FILE_NAME = "bench-upload.mp3"
+
+# Every scenario returns a false value when the request path failed without opening an error dialog
+SCENARIOS = {
+    "upload_audio": lambda frontend: frontend.make_audio_upload_request(random_video_url()) or True,
+    "upload_playlist": lambda frontend: frontend.make_playlist_upload_request(random_playlist_url()) or True,
+    "download_audio": lambda frontend: frontend.make_download_audio_request(random_video_url()),
+    "download_playlist": lambda frontend: frontend.make_download_playlist_request(random_playlist_url()),
+    "download_audio_cached": lambda frontend: frontend.make_download_audio_request(
+        "https://www.youtube.com/watch?v=benchcached"
+    ),
+    "upload_received_audio": lambda frontend: frontend.make_audio_file_upload_request(UPLOAD_FILE_NAME),
+    "signup": lambda frontend: frontend.make_post_user_register_request() or True,
+    "login": lambda frontend: frontend.make_post_user_login_request() or True,
+}
+
+
+def count_error_dialogs(frontend):
+    """
+    Make the error dialogs of a FrontEnd observable per thread, as the request paths report failures through them.
+
+    Returns:
+        threading.local: Its "failed" attribute is set when the current thread opened an error dialog.
+    """
+    state = threading.local()
+    show_error_dialog = frontend.show_error_dialog
+
+    def counting_show_error_dialog(title_text, error_message):
+        state.failed = True
+        show_error_dialog(title_text, error_message)
+
+    frontend.show_error_dialog = counting_show_error_dialog
+    return state
+
+
+def run_scenario(frontend, error_state, scenario, requests, concurrency):
+    """
+    Run a scenario requests times with a given concurrency.
+
+    Returns:
+        tuple: The latencies of the calls in seconds, the number of failed calls and the elapsed seconds.
+    """
+    func = SCENARIOS[scenario]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def call(_):
+        error_state.failed = False
+        start = time.perf_counter()
+        try:
+            succeeded = func(frontend)
+        except Exception:
+            succeeded = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if error_state.failed or not succeeded:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent calls")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenarios to run")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    backend, port = start_fake_backend(options_from_arguments(args))
+    workdir = enter_temp_workdir()
+    try:
+        with open(os.path.join("assets", "uploads", UPLOAD_FILE_NAME), "wb") as f:
+            f.truncate(args.payload_bytes)
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            frontend = FrontEnd(FakePage(), "127.0.0.1", str(port), "127.0.0.1")
+        error_state = count_error_dialogs(frontend)
+
+        print(LATENCY_HEADER)
+        for scenario in args.scenarios.split(","):
+            # The request paths print a lot, which would skew the timings
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                latencies, errors, elapsed = run_scenario(frontend, error_state, scenario, args.requests,
+                                                          args.concurrency)
+            print(format_latency_row(scenario, latencies, errors, elapsed))
+        print("peak RSS: {:.1f} MB".format(peak_rss_bytes() / 1024 ** 2))
+    finally:
+        backend.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the ytm-offline backend, implementing the /api/global/* endpoints used by the frontend.
+
+    python bench/fake_backend.py --port 5000 --latency 50 --payload-bytes 10000000 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 64 * 1024
+
+JSON_ENDPOINTS = {
+    "/api/global/uploadAudio": 200,
+    "/api/global/uploadPlaylist": 200,
+    "/api/global/signup": 201,
+    "/api/global/login": 201,
+}
+DOWNLOAD_ENDPOINTS = (
+    "/api/global/downloadAudio",
+    "/api/global/downloadPlaylist",
+)
+UPLOAD_RECEIVED_AUDIO = "/api/global/uploadReceivedAudio"
+
+
+class FakeBackendConfig:
+    def __init__(self, latency=0.0, jitter=0.0, payload_bytes=1024 * 1024, error_rate=0.0):
+        """
+        Args:
+            latency (float): Seconds waited before answering every request.
+            jitter (float): Maximum random seconds added to the latency.
+            payload_bytes (int): Size of the body returned by the download endpoints.
+            error_rate (float): Probability between 0 and 1 of answering with a 500.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_bytes = payload_bytes
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are written separately, avoid delayed ACK stalls
+    config = FakeBackendConfig()
+    chunk = b"\0" * CHUNK_SIZE
+
+    def do_GET(self):
+        # Cheap health check
+        self._send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        config = self.config
+        with config.lock:
+            config.requests += 1
+
+        self._drain_body()
+        time.sleep(config.latency + random.uniform(0, config.jitter))
+
+        if random.random() < config.error_rate:
+            self._send_json(500, {"error": "injected failure"})
+        elif self.path in JSON_ENDPOINTS:
+            self._send_json(JSON_ENDPOINTS[self.path], {"status": "ok"})
+        elif self.path in DOWNLOAD_ENDPOINTS:
+            self._send_payload(config.payload_bytes)
+        elif self.path == UPLOAD_RECEIVED_AUDIO:
+            self._send_json(200, {"status": "received"})
+        else:
+            self._send_json(404, {"error": "unknown endpoint"})
+
+    def _drain_body(self):
+        remaining = int(self.headers.get("Content-Length", "0"))
+        while remaining > 0:
+            data = self.rfile.read(min(remaining, CHUNK_SIZE))
+            if not data:
+                break
+            remaining -= len(data)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_payload(self, size):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        while size > 0:
+            data = self.chunk[:min(size, CHUNK_SIZE)]
+            self.wfile.write(data)
+            size -= len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_fake_backend(host="127.0.0.1", port=0, config=None):
+    """
+    Create the fake backend server. Call serve_forever() on it to run it.
+
+    Args:
+        host (str, optional): The address to listen on.
+        port (int, optional): The port to listen on, 0 for any free port.
+        config (FakeBackendConfig, optional): The behaviour of the backend.
+
+    Returns:
+        ThreadingHTTPServer: The server; its port is server_address[1].
+    """
+    handler = type("ConfiguredFakeBackendHandler", (FakeBackendHandler,), {"config": config or FakeBackendConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host, port, options, ready=None):
+    """
+    Run a fake backend until the process is killed, e.g. as a multiprocessing target.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 for any free port.
+        options (dict): The keyword arguments of FakeBackendConfig.
+        ready (Queue, optional): Receives the port once the server listens.
+    """
+    server = create_fake_backend(host, port, FakeBackendConfig(**options))
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--latency", type=float, default=20, help="backend latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra latency in milliseconds")
+    parser.add_argument("--payload-bytes", type=int, default=1024 * 1024, help="size of downloaded files")
+    parser.add_argument("--error-rate", type=float, default=0, help="probability of a 500 response")
+
+
+def options_from_arguments(args):
+    return {
+        "latency": args.latency / 1000,
+        "jitter": args.jitter / 1000,
+        "payload_bytes": args.payload_bytes,
+        "error_rate": args.error_rate,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    print("Fake backend listening on", args.host + ":" + str(args.port))
+    serve(args.host, args.port, options_from_arguments(args))
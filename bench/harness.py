@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared pieces of the benchmarks: the fake backend process, a headless stand-in for the Flet Page, and statistics.
+"""
+import multiprocessing
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fake_backend import serve  # noqa: E402
+
+
+class FakePage:
+    """
+    Headless stand-in for flet.Page with the attributes and methods FrontEnd uses, so sessions can be driven
+    without a browser. Updates are counted instead of being sent.
+    """
+
+    def __init__(self, route="/"):
+        self.route = route
+        self.title = None
+        self.theme = None
+        self.dark_theme = None
+        self.theme_mode = "dark"
+        self.vertical_alignment = None
+        self.horizontal_alignment = None
+        self.views = []
+        self.overlay = []
+        self.dialog = None
+        self.on_route_change = None
+        self.on_view_pop = None
+        self.on_disconnect = None
+        self.on_close = None
+        self.updates = 0
+        self.launched_urls = []
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def go(self, route):
+        self.route = route
+        if self.on_route_change is not None:
+            self.on_route_change(None)
+
+    def launch_url(self, url):
+        self.launched_urls.append(url)
+
+    def get_upload_url(self, file_name, expires):
+        return "http://127.0.0.1/upload/" + file_name + "?expires=" + str(expires)
+
+    def append(self, control):
+        self.views.append(control)
+
+
+def start_fake_backend(options):
+    """
+    Start the fake backend in its own process, so it does not compete with the frontend for the GIL or memory.
+
+    Args:
+        options (dict): The keyword arguments of FakeBackendConfig.
+
+    Returns:
+        tuple: The process and the port it listens on.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=("127.0.0.1", 0, options, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=10)
+
+
+def enter_temp_workdir():
+    """
+    Move into a fresh temporary directory, so assets/uploads written by the benchmark stays out of the repo.
+
+    Returns:
+        str: The directory.
+    """
+    directory = tempfile.mkdtemp(prefix="ytm-bench-")
+    os.makedirs(os.path.join(directory, "assets", "uploads"))
+    os.chdir(directory)
+    return directory
+
+
+def random_video_url():
+    video_id = "".join(random.choice(string.ascii_letters + string.digits) for _ in range(11))
+    return "https://www.youtube.com/watch?v=" + video_id
+
+
+def random_playlist_url():
+    playlist_id = "PL" + "".join(random.choice(string.ascii_letters + string.digits) for _ in range(32))
+    return "https://www.youtube.com/playlist?list=" + playlist_id
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return peak_rss_bytes()  # Not Linux: the peak is the best approximation available
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_latency_row(name, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return "{:<24} {:>7} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+        name,
+        len(latencies),
+        errors,
+        percentile(latencies, 0.50) * 1000,
+        percentile(latencies, 0.95) * 1000,
+        percentile(latencies, 0.99) * 1000,
+        len(latencies) / elapsed if elapsed else 0,
+    )
+
+
+LATENCY_HEADER = "{:<24} {:>7} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+    "scenario", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "req/s"
+)
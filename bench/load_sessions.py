@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Simulate many concurrent Flet sessions, each with its own FrontEnd, against a local fake backend.
+
+    python bench/load_sessions.py --sessions 10,50,100,200 --duration 30 --latency 50 --payload-bytes 2000000
+"""
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import threading
+import time
+import types
+
+from harness import (
+    FakePage,
+    LATENCY_HEADER,
+    current_rss_bytes,
+    enter_temp_workdir,
+    format_latency_row,
+    random_video_url,
+    start_fake_backend,
+)
+from fake_backend import add_backend_arguments, options_from_arguments
+
+from FrontEnd import FrontEnd  # noqa: E402
+from jobs import get_job_queue, QUEUED, RUNNING  # noqa: E402
+
+ROUTES = ["/", "/audio", "/playlist", "/audio/upload", "/playlist/upload", "/audio/download",
+          "/playlist/download", "/register"]
+
+# Seconds a flow waits for its background job before counting as failed
+JOB_TIMEOUT = 120
+
+
+def flow_navigate(frontend, session_id, upload_size):
+    for route in random.sample(ROUTES, 4):
+        frontend.page.go(route)
+    return True
+
+
+def flow_login(frontend, session_id, upload_size):
+    # In Flet the on_change handlers store the change event, whose data is the typed value
+    frontend.email = types.SimpleNamespace(data="user" + str(session_id) + "@example.com")
+    frontend.password = types.SimpleNamespace(data="password")
+    # Every attempt starts logged out, so it only counts as a success when this login went through
+    frontend.disable_login_status()
+    frontend.page.go("/")
+    frontend.make_post_user_login_request()
+    return frontend.isLogin
+
+
+def flow_submit_url(frontend, session_id, upload_size):
+    frontend.page.go("/audio")
+    frontend.txt_url.value = random_video_url()
+    frontend.submit_audio(frontend.txt_url)
+    return True
+
+
+def flow_download(frontend, session_id, upload_size):
+    frontend.page.go("/audio/download")
+    frontend.txt_url.value = random_video_url()
+    job = frontend.submit_download_job("audio", frontend.txt_url.value, frontend.make_download_audio_request)
+    finished = threading.Event()
+    job.subscribe(lambda changed_job: changed_job.is_finished() and finished.set())
+    if job.is_finished():
+        finished.set()
+    return finished.wait(JOB_TIMEOUT) and job.error is None
+
+
+def flow_upload(frontend, session_id, upload_size):
+    """
+    Go through the file picker path: pick a file, receive its browser upload progress, wait for the forwarding.
+    """
+    frontend.page.go("/audio/upload")
+    file_name = "session-" + str(session_id) + "-" + str(random.getrandbits(32)) + ".mp3"
+    with open(os.path.join("assets", "uploads", file_name), "wb") as f:
+        f.truncate(upload_size)
+
+    picked_file = types.SimpleNamespace(name=file_name, size=upload_size)
+    frontend.file_picker_result(types.SimpleNamespace(files=[picked_file]))
+    for progress in (0.25, 0.5, 0.75, 1.0):
+        frontend.on_upload_progress(types.SimpleNamespace(file_name=file_name, progress=progress, error=None))
+
+    deadline = time.monotonic() + JOB_TIMEOUT
+    state_text = frontend.upload_states[file_name]
+    while time.monotonic() < deadline:
+        if state_text.value == "done":
+            return True
+        if state_text.value.startswith("failed"):
+            return False
+        time.sleep(0.01)
+    return False
+
+
+FLOWS = {
+    "navigate": flow_navigate,
+    "login": flow_login,
+    "submit_url": flow_submit_url,
+    "download": flow_download,
+    "upload": flow_upload,
+}
+
+# Relative frequency of the flows, roughly what a real user does
+FLOWS_WEIGHTS = {
+    "navigate": 5,
+    "login": 1,
+    "submit_url": 3,
+    "download": 2,
+    "upload": 1,
+}
+
+
+class LoadResults:
+    def __init__(self, flows):
+        self.latencies = {flow: [] for flow in flows}
+        self.errors = {flow: 0 for flow in flows}
+        self.lock = threading.Lock()
+
+    def record(self, flow, elapsed, succeeded):
+        with self.lock:
+            self.latencies[flow].append(elapsed)
+            if not succeeded:
+                self.errors[flow] += 1
+
+
+class SaturationMonitor:
+    """
+    Sample the thread count and the backlog of the shared job queues while the load runs.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            sample = {"threads": threading.active_count()}
+            for name in ("downloads", "uploads"):
+                queue = get_job_queue(name)
+                jobs = queue.list_jobs()
+                sample[name + "_queued"] = sum(1 for job in jobs if job.state == QUEUED)
+                sample[name + "_busy"] = sum(1 for job in jobs if job.state == RUNNING) / queue.max_workers
+            self.samples.append(sample)
+
+    def report(self):
+        if not self.samples:
+            return "no saturation samples"
+        lines = []
+        for key in self.samples[0]:
+            values = [sample[key] for sample in self.samples]
+            if key.endswith("_busy"):
+                lines.append("  {:<18} mean {:>6.0%}  max {:>6.0%}".format(key, sum(values) / len(values),
+                                                                           max(values)))
+            else:
+                lines.append("  {:<18} mean {:>6.1f}  max {:>6}".format(key, sum(values) / len(values), max(values)))
+        return "\n".join(lines)
+
+
+def run_session(frontend, session_id, flows, weights, results, stop_event, think_time, upload_size):
+    while not stop_event.is_set():
+        flow = random.choices(flows, weights)[0]
+        start = time.perf_counter()
+        try:
+            succeeded = FLOWS[flow](frontend, session_id, upload_size)
+        except Exception:
+            succeeded = False
+        results.record(flow, time.perf_counter() - start, succeeded)
+        stop_event.wait(random.expovariate(1 / think_time) if think_time else 0)
+
+
+def run_level(sessions, args, port):
+    """
+    Run one load level: create the sessions and let them run the flows for the duration.
+
+    Returns:
+        tuple: The LoadResults, the SaturationMonitor, the elapsed seconds and the RSS per session when created and
+            after the load.
+    """
+    flows = args.flows.split(",")
+    weights = [FLOWS_WEIGHTS.get(flow, 1) for flow in flows]
+
+    rss_before = current_rss_bytes()
+    frontends = [
+        FrontEnd(FakePage(), "127.0.0.1", str(port), "127.0.0.1")
+        for _ in range(sessions)
+    ]
+    rss_per_session = [(current_rss_bytes() - rss_before) / sessions]
+
+    results = LoadResults(flows)
+    monitor = SaturationMonitor()
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(frontend, session_id, flows, weights, results, stop_event, args.think_time, args.upload_bytes),
+            daemon=True
+        )
+        for session_id, frontend in enumerate(frontends)
+    ]
+
+    monitor.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if args.ramp_up:
+            time.sleep(args.ramp_up / sessions)
+    time.sleep(max(0, args.duration - (time.perf_counter() - start)))
+    stop_event.set()
+    for thread in threads:
+        thread.join(JOB_TIMEOUT)
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+    rss_per_session.append((current_rss_bytes() - rss_before) / sessions)
+
+    for frontend in frontends:
+        frontend.on_close()
+    return results, monitor, elapsed, rss_per_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="10,50,100", help="comma separated session counts to run in turn")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per session count")
+    parser.add_argument("--ramp-up", type=float, default=2, help="seconds over which the sessions start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between two flows of a session")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma separated flows to run")
+    parser.add_argument("--upload-bytes", type=int, default=1024 * 1024, help="size of the uploaded files")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    backend, port = start_fake_backend(options_from_arguments(args))
+    workdir = enter_temp_workdir()
+    try:
+        for sessions in [int(count) for count in args.sessions.split(",")]:
+            # The request paths print a lot, which would skew the timings
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results, monitor, elapsed, rss_per_session = run_level(sessions, args, port)
+
+            print()
+            print("=== {} sessions, {:.0f} s ===".format(sessions, elapsed))
+            print(LATENCY_HEADER.replace("scenario", "flow    "))
+            for flow, latencies in results.latencies.items():
+                print(format_latency_row(flow, latencies, results.errors[flow], elapsed))
+            print("memory per session: {:.1f} KB when created, {:.1f} KB after the load".format(
+                rss_per_session[0] / 1024, rss_per_session[1] / 1024
+            ))
+            print("saturation:")
+            print(monitor.report())
+    finally:
+        backend.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
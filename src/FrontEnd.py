@@ -1,7 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import functools
+import hashlib
 import os
-import uuid as uuid
+import threading
+import zipfile
+from urllib.parse import quote
+
+import requests
 from flet import (
     AppBar,
     Page,
@@ -13,6 +19,7 @@ from flet import (
     FilePickerUploadEvent,
     FilePickerUploadFile,
     ProgressRing,
+    ProgressBar,
     Ref,
     Column,
     Row,
@@ -24,59 +31,92 @@ from flet import (
     ButtonStyle,
     MaterialState,
     RoundedRectangleBorder,
+    DataTable,
+    DataColumn,
+    DataRow,
+    DataCell,
     app,
     AppView
 )
-import requests
 from typing import Dict
-from time import sleep
 
 from flet_constructors import *
+from backend_client import (
+    BackendUnavailableError,
+    UPLOAD_AUDIO,
+    UPLOAD_PLAYLIST,
+    DOWNLOAD_AUDIO,
+    DOWNLOAD_PLAYLIST,
+    UPLOAD_RECEIVED_AUDIO,
+    SIGNUP,
+    LOGIN
+)
+from backend_pool import get_backend_pool, parse_backend_targets
+from uploads_storage import save_response, get_upload_path, notify_saved, pin, pinned, unpin
+from jobs import get_job_queue, DONE
+from scheduler import get_scheduler
+from library_index import DOWNLOAD, get_library_index, get_response_metadata, index_uploaded_file
+from library_view import LibraryList
+from download_cache import get_download_cache, audio_cache_key, playlist_cache_key
+from singleflight import get_single_flight, request_key
+from janitor import start_janitor
+from youtube_urls import get_video_id, get_playlist_id, parse_url_list
+from upload_progress import UploadProgressAggregator
+from zip_playlist import get_track_name, list_tracks, upload_track
+from resumable_uploads import TOKEN_MAX_AGE, issue_upload_token, register_resumable_upload_routes
+from metrics import ACTIVE_SESSIONS, TRANSFERRED_BYTES, serve_metrics
+from side_server import (
+    register_route,
+    start_side_server,
+    DEFAULT_PORT as SIDE_SERVER_PORT,
+    PUBLIC_URL as SIDE_SERVER_PUBLIC_URL
+)
+from file_server import FILES_PREFIX, serve_file
 
+# Finished download jobs kept in a job list; older ones are dropped so the list, and every update of it, stays small
+MAX_FINISHED_JOB_ROWS = 20
 
-def make_post_request(url, data):
-    """
-    Make a POST request to the specified URL with JSON data.
-
-    Args:
-        url (str): The URL to send the POST request to.
-        data (dict): The JSON data to include in the request body.
 
-    Returns:
-        dict or None: The JSON response if the request is successful, None otherwise.
+def backend_call(method):
     """
-    try:
-        response = requests.post(url, json=data)
-        response.raise_for_status()  # Raise an exception for HTTP errors (non-2xx status codes)
-        return response  # Return response data in JSON format
-    except requests.exceptions.RequestException as e:
-        print("POST request failed:", e)
-        return None
-
-
-def make_post_file_request(url, file):
+    Decorate a FrontEnd request method so that, while the backend circuit is open, it shows a "Backend
+    unavailable" dialog and returns None right away instead of waiting for the backend.
     """
-    Make a POST request to the specified file with JSON data.
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except BackendUnavailableError as e:
+            self.show_error_dialog("Backend unavailable", str(e))
+            return None
 
-    Args:
-        url (str): The URL to send the POST request to.
-    """
-    try:
-        response = requests.post(url, files=file)
-        response.raise_for_status()  # Raise an exception for HTTP errors (non-2xx status codes)
-        return response  # Return response data in JSON format
-    except requests.exceptions.RequestException as e:
-        print("POST request failed:", e)
-        return None
+    return wrapper
 
 
 class FrontEnd:
-    def __init__(self, page: Page, host_address, host_port, self_host_address, self_host_port):
+    def __init__(self, page: Page, host_address, host_port, self_host_address, backend_targets=None):
         self.email: Text = Text("")
         self.password: Text = Text("")
         self.isLogin = False
         self.txt_url: TextField = None
+        # One job list per download view, so each only shows its own kind of downloads
+        self.job_lists = {"audio": Column(), "playlist": Column()}
+        self.job_lists_lock = threading.Lock()
+        self.bulk_controls = {}
+        self.views: Dict[str, View] = {}
+        self.url_fields: Dict[str, TextField] = {}
+        self.upload_refs: Dict[str, tuple] = {}
+        self.library_list: LibraryList = None
+        self.files = Ref[Column]()
+        self.upload_button = Ref[ElevatedButton]()
+        self.upload_summary = Ref[Text]()
+        self.scheduler = get_scheduler()
+        # Owner of the scheduled dialog closes, so navigation cancels them without the other calls of the session
+        self.dialog_closes = object()
+        self.auto_closed_dialog = None
+        self.library = get_library_index()
         self.page = page
+        self.upload_progress = UploadProgressAggregator(page, self.scheduler, self)
         self.page.title = "ytm-manager"
 
         # Configure the theme of the page
@@ -145,24 +185,45 @@ class FrontEnd:
             colors.RED
         )
 
+        # Library PopupMenuItem
+        self.library_icon_button = create_icon_button(
+            lambda _: self.page.go("/library"),
+            "Library",
+            icons.LIBRARY_MUSIC,
+            icons.LIBRARY_MUSIC_OUTLINED,
+            colors.GREY,
+            colors.RED
+        )
+
         # Define event handlers
         self.page.on_route_change = self.route_change
         self.page.on_view_pop = self.view_pop
+        self.page.on_disconnect = self.on_disconnect
+        self.page.on_close = self.on_close
+        ACTIVE_SESSIONS.inc()
 
         # Initialize properties
         self.route_change()
 
         self.host_address = host_address
         self.host_port = host_port
+        # Requests are balanced over backend_targets when given, otherwise they all go to host_address:host_port
+        self.backend = get_backend_pool(backend_targets or [(host_address, host_port)])
+        self.download_jobs = get_job_queue("downloads")
+        self.download_cache = get_download_cache()
+        self.in_flight = get_single_flight()
 
         self.self_host_address = self_host_address
-        self.self_host_port = self_host_port
 
         self.prog_bars: Dict[str, ProgressRing] = {}
-        self.files = Ref[Column]()
+        self.upload_states: Dict[str, Text] = {}
+        self.forwarded_files = set()
+        self.track_lists = {}
+        self.upload_count_lock = threading.Lock()
+        self.upload_jobs = get_job_queue("uploads")
+        self.bulk_jobs = get_job_queue("bulk")
         self.total_files_to_upload = 0
         self.successfully_uploaded_files = 0
-        self.upload_button = Ref[ElevatedButton]()
 
         self.dialog = Ref[AlertDialog]()
 
@@ -178,9 +239,13 @@ class FrontEnd:
         self.page.update()
 
     def enable_login_status(self):
+        if not self.isLogin:
+            self.invalidate_views()
         self.isLogin = True
 
     def disable_login_status(self):
+        if self.isLogin:
+            self.invalidate_views()
         self.isLogin = False
 
     def process_menu_buttons(self):
@@ -212,6 +277,7 @@ class FrontEnd:
                 self.playlist_upload_icon_button,
                 self.audio_upload_2_icon_button,
                 self.playlist_upload_2_icon_button,
+                self.library_icon_button,
                 self.process_menu_buttons()
             ]
         return menu_buttons
@@ -511,6 +577,8 @@ class FrontEnd:
         """
         self.upload_button.current.disabled = True if e.files is None else False
         self.prog_bars.clear()
+        self.upload_states.clear()
+        self.track_lists.clear()
         self.files.current.controls.clear()
         if e.files is not None:
             for f in e.files:
@@ -520,8 +588,19 @@ class FrontEnd:
                     width=20,
                     height=20
                 )
+                state_text = Text("")
                 self.prog_bars[f.name] = prog
-                self.files.current.controls.append(Row([prog, Text(f.name)]))
+                self.upload_states[f.name] = state_text
+                self.files.current.controls.append(Row([prog, Text(f.name), state_text]))
+                if f.name.lower().endswith(".zip"):
+                    # Receives the result of every track of the playlist archive
+                    self.track_lists[f.name] = Column()
+                    self.files.current.controls.append(self.track_lists[f.name])
+        self.upload_progress.reset(
+            self.prog_bars,
+            {f.name: f.size for f in e.files or []},
+            self.upload_summary.current
+        )
         self.page.update()
 
     def on_upload_progress(self, e: FilePickerUploadEvent):
@@ -531,11 +610,70 @@ class FrontEnd:
         Args:
             e (FilePickerUploadEvent): The event object containing file upload progress information.
         """
-        self.prog_bars[e.file_name].value = e.progress
-        self.prog_bars[e.file_name].update()
+        if e.progress is not None:
+            # Throttled: all the files of the batch are sent to the client together a few times per second
+            self.upload_progress.record(e.file_name, e.progress)
+
+        if e.progress == 1 and e.file_name not in self.forwarded_files:  # Check if the upload progress is 100%
+            self.forwarded_files.add(e.file_name)
+            TRANSFERRED_BYTES.inc(self.upload_progress.sizes.get(e.file_name, 0), "browser_upload")
+            notify_saved(e.file_name)
+            self.forward_uploaded_file(e.file_name)
+
+    def forward_uploaded_file(self, file_name):
+        """
+        Enqueue the forwarding of a file that finished uploading to assets/uploads to the backend.
 
-        if e.progress == 1:  # Check if the upload progress is 100%
-            self.increment_uploaded_files_count()  # Call the function to increment the count
+        Forwarding runs on the bounded "uploads" job queue, so the rest of the batch keeps uploading meanwhile.
+        Playlist archives are handed to forward_uploaded_playlist.
+
+        Args:
+            file_name (str): The name of the uploaded file.
+        """
+        if file_name.lower().endswith(".zip"):
+            self.forward_uploaded_playlist(file_name)
+            return
+
+        state_text = self.upload_states.get(file_name)
+
+        def on_job_change(job):
+            if state_text is not None:
+                state_text.value = job.state if job.error is None else job.state + ": " + job.error
+                if state_text.page is not None:
+                    state_text.update()
+            if job.state == DONE:
+                self.increment_uploaded_files_count()  # Call the function to increment the count
+
+        self.upload_jobs.submit(
+            "upload",
+            file_name,
+            lambda job: self.run_sticky_job(job, lambda: self.make_audio_file_upload_request(job.description)),
+            on_job_change
+        )
+
+    def forward_uploaded_playlist(self, file_name):
+        """
+        Enqueue the ingestion of a playlist archive that finished uploading to assets/uploads.
+
+        Args:
+            file_name (str): The name of the uploaded archive.
+        """
+        state_text = self.upload_states.get(file_name)
+        track_list = self.track_lists.get(file_name)
+
+        def on_job_change(job):
+            # Once the archive is read, the track jobs report the progress of the playlist
+            if state_text is not None and job.state != DONE:
+                state_text.value = "reading archive" if job.error is None else job.state + ": " + job.error
+                if state_text.page is not None:
+                    state_text.update()
+
+        self.upload_jobs.submit(
+            "playlist",
+            file_name,
+            lambda job: self.make_playlist_file_upload_request(job.description, state_text, track_list),
+            on_job_change
+        )
 
     def show_success_dialog(self):
         if self.total_files_to_upload == 1 and self.successfully_uploaded_files == self.total_files_to_upload:
@@ -559,8 +697,9 @@ class FrontEnd:
         open_dlg(self.page, create_simple_alert_dialog(title_text, error_message))
 
     def increment_uploaded_files_count(self):
-        self.successfully_uploaded_files += 1
-        self.show_success_dialog()
+        with self.upload_count_lock:
+            self.successfully_uploaded_files += 1
+            self.show_success_dialog()
 
     def upload_files(self, e):
         """
@@ -571,6 +710,7 @@ class FrontEnd:
         """
         self.total_files_to_upload = 0
         self.successfully_uploaded_files = 0
+        self.forwarded_files.clear()
         upload_list = []
 
         if self.file_picker.result is not None and self.file_picker.result.files is not None:
@@ -585,17 +725,27 @@ class FrontEnd:
                 )
             self.file_picker.upload(upload_list)
 
-    def create_custom_upload_file_view(self, view_path, view_name):
+    def create_custom_upload_file_view(self, view_path, view_name, allowed_extensions):
         """
         Create a view for uploading files.
 
         Args:
             view_path (str): The route path for the upload view.
             view_name (str): The name of the upload view.
+            allowed_extensions (list): The file extensions the file picker accepts.
 
         Returns:
             View: The upload file view.
         """
+        # Every upload view keeps its own file list and button, which route_change makes current
+        self.files = Ref[Column]()
+        self.upload_button = Ref[ElevatedButton]()
+        self.upload_summary = Ref[Text]()
+        self.upload_refs[view_path] = (self.files, self.upload_button, self.upload_summary)
+        # Upload tokens are for logged-in users only; the views are rebuilt when the login status changes
+        resumable_controls = [
+            create_button("Resumable upload...", self.show_resumable_upload_token, icons.KEY)
+        ] if self.isLogin else []
         return View(
             view_path,
             [
@@ -604,16 +754,39 @@ class FrontEnd:
                 create_button(
                     "Select files...",
                     lambda _: self.file_picker.pick_files(
-                        allow_multiple=False,
-                        allowed_extensions=["mp3"],
+                        allow_multiple=True,
+                        allowed_extensions=allowed_extensions,
                     ),
                     icon=icons.FOLDER_OPEN
                 ),
+                Text(ref=self.upload_summary),
                 Column(ref=self.files),
-                create_button("Upload", self.upload_files, icons.UPLOAD, self.upload_button, True)
+                create_button("Upload", self.upload_files, icons.UPLOAD, self.upload_button, True),
+                *resumable_controls
             ],
         )
 
+    def show_resumable_upload_token(self, e=None):
+        """
+        Show how to upload a large file with the resumable client, with a token allowing it to start uploads.
+        Anonymous users get no token.
+
+        Args:
+            e: The event object (not used).
+        """
+        if not self.isLogin:
+            self.show_error_dialog("Resumable upload", "Log in to get an upload token.")
+            return
+        command = (
+            "python3 src/resumable_client.py " + self.get_side_server_url() + " <file> --token " +
+            issue_upload_token()
+        )
+        self.show_simple_alert_dialog(
+            "Resumable upload",
+            "Run, within " + str(TOKEN_MAX_AGE // 60) + " minutes:\n" + command,
+            False
+        )
+
     def show_simple_alert_dialog(self, title_text, content_text, is_auto_closed=True, delay=2):
         # Create an alert dialog with the given title and content
         alert_dialog = create_simple_alert_dialog(title_text, content_text)
@@ -621,11 +794,53 @@ class FrontEnd:
         # Show the dialog
         open_dlg(self.page, alert_dialog)
 
-        # Close the dialog and print the message when all files are uploaded
+        # Close the dialog later from the shared scheduler instead of blocking this handler thread
         if is_auto_closed:
-            sleep(delay)
+            self.auto_closed_dialog = alert_dialog
+            self.scheduler.call_later(delay, lambda: self.close_dialog(alert_dialog), owner=self.dialog_closes)
+
+    def close_dialog(self, alert_dialog):
+        """
+        Close a dialog if it is still the one shown on the page.
+
+        Args:
+            alert_dialog (AlertDialog): The dialog to close.
+        """
+        if self.page.dialog is alert_dialog and alert_dialog.open:
             close_dlg(self.page)
 
+    def cancel_dialog_closes(self):
+        """
+        Cancel the pending dialog closes of the session, and close the dialog waiting for one right away instead of
+        leaving it open. The page is not updated.
+        """
+        self.scheduler.cancel_owner(self.dialog_closes)
+        dialog, self.auto_closed_dialog = self.auto_closed_dialog, None
+        if dialog is not None and self.page.dialog is dialog:
+            dialog.open = False
+
+    def on_disconnect(self, e=None):
+        """
+        Cancel the pending scheduler calls of the session (dialog closes, upload progress flushes) when its client
+        disconnects. A dialog waiting for its close is closed, so a reconnecting client does not find it stuck open.
+
+        Args:
+            e: The event object (not used).
+        """
+        self.cancel_dialog_closes()
+        self.scheduler.cancel_owner(self)
+
+    def on_close(self, e=None):
+        """
+        Release the session when it expires.
+
+        Args:
+            e: The event object (not used).
+        """
+        self.cancel_dialog_closes()
+        self.scheduler.cancel_owner(self)
+        ACTIVE_SESSIONS.dec()
+
     def show_modal_alert_dialog(self, title_text, content_text, yes_func, no_func):
         # Create an alert dialog with the given title and content
         alert_dialog = create_modal_alert_dialog(title_text, content_text, yes_func, no_func)
@@ -633,68 +848,126 @@ class FrontEnd:
         # Show the dialog
         open_dlg(self.page, alert_dialog)
 
-    def route_change(self, e=None):
+    def build_view(self, route):
         """
-        Handle route changes and update views accordingly.
+        Build the view of a route.
 
         Args:
-            e: The event object (not used).
+            route (str): The route, e.g. "/audio".
+
+        Returns:
+            View or None: The view, or None if the route has no view of its own.
         """
-        self.page.views.clear()
-        self.page.views.append(self.create_main_view())
+        if route == "/":
+            return self.create_main_view()
 
-        if self.page.route == "/audio":
-            self.txt_url = create_simple_textfield("Enter song URL")
-            print("INITIALIZING TEXT URL WITH THE TEXT", self.txt_url.value)
-            self.page.views.append(
-                create_custom_view(self.txt_url, "/audio", "Audio URL", self.submit_audio)
+        if route == "/audio":
+            return create_custom_view(
+                self.create_url_field(route, "Enter song URL"), "/audio", "Audio URL", self.submit_audio,
+                *self.get_bulk_controls("/audio", UPLOAD_AUDIO, "audio_url", get_video_id)
             )
-            print("View is created.")
 
-        if self.page.route == "/playlist":
-            self.txt_url = create_simple_textfield("Enter playlist URL")
-            self.page.views.append(
-                create_custom_view(self.txt_url, "/playlist", "Playlist URL", self.submit_playlist)
+        if route == "/playlist":
+            return create_custom_view(
+                self.create_url_field(route, "Enter playlist URL"), "/playlist", "Playlist URL", self.submit_playlist,
+                *self.get_bulk_controls("/playlist", UPLOAD_PLAYLIST, "playlist_url", get_playlist_id)
             )
 
-        if self.page.route == "/audio/upload":
-            self.page.views.append(
-                self.create_custom_upload_file_view("/audio/upload", "Upload .mp3 audio")
-            )
+        if route == "/audio/upload":
+            return self.create_custom_upload_file_view("/audio/upload", "Upload .mp3 audio", ["mp3"])
 
-        if self.page.route == "/playlist/upload":
-            self.page.views.append(
-                self.create_custom_upload_file_view("/playlist/upload", "Upload .zip playlist")
-            )
+        if route == "/playlist/upload":
+            return self.create_custom_upload_file_view("/playlist/upload", "Upload .zip playlist", ["zip"])
 
-        if self.page.route == "/audio/download":
-            self.txt_url = create_simple_textfield("Enter audio URL")
-            self.page.views.append(
-                create_custom_view(self.txt_url, "/audio/download", "Download Audio", self.download_audio)
+        if route == "/audio/download":
+            return create_custom_view(
+                self.create_url_field(route, "Enter audio URL"), "/audio/download", "Download Audio",
+                self.download_audio, self.job_lists["audio"]
             )
 
-        if self.page.route == "/playlist/download":
-            self.txt_url = create_simple_textfield("Enter playlist URL")
-            self.page.views.append(
-                create_custom_view(self.txt_url, "/playlist/download", "Download Playlist", self.download_playlist)
+        if route == "/playlist/download":
+            return create_custom_view(
+                self.create_url_field(route, "Enter playlist URL"), "/playlist/download", "Download Playlist",
+                self.download_playlist, self.job_lists["playlist"]
             )
 
-        if self.page.route == "/login":
-            print("login")
-            self.txt_url = create_simple_textfield("Log In")
-            self.page.views.append(
-                create_custom_view(self.txt_url, "/login", "Log In", self.submit_playlist)
+        if route == "/library":
+            self.library_list = LibraryList(
+                self.page,
+                self.library,
+                lambda file_name: self.page.launch_url(self.get_file_url(file_name))
             )
+            self.library_list.reload()
+            return View("/library", [
+                create_simple_appbar("Library", colors.SURFACE_VARIANT),
+                *self.library_list.get_controls()
+            ])
 
-        if self.page.route == "/register":
-            self.page.views.append(
-                self.create_register_view()
-            )
+        if route == "/login":
+            return create_custom_view(self.create_url_field(route, "Log In"), "/login", "Log In", self.submit_playlist)
 
-        if self.page.route == "/account":
-            self.page.views.append(
-                self.create_options_view()
-            )
+        if route == "/register":
+            return self.create_register_view()
+
+        if route == "/account":
+            return self.create_options_view()
+
+        return None
+
+    def get_view(self, route):
+        """
+        Get the view of a route, building it only the first time it is visited in this session.
+
+        Args:
+            route (str): The route, e.g. "/audio".
+
+        Returns:
+            View or None: The view, or None if the route has no view of its own.
+        """
+        view = self.views.get(route)
+        if view is None:
+            view = self.build_view(route)
+            if view is not None:
+                self.views[route] = view
+        return view
+
+    def invalidate_views(self):
+        """
+        Forget every cached view, so they get rebuilt on the next navigation.
+        """
+        self.views.clear()
+        self.url_fields.clear()
+        self.upload_refs.clear()
+        self.library_list = None
+
+    def create_url_field(self, route, label_text):
+        url_field = create_simple_textfield(label_text)
+        self.url_fields[route] = url_field
+        return url_field
+
+    def route_change(self, e=None):
+        """
+        Handle route changes and update views accordingly.
+
+        Views are cached per route, so navigating only swaps the cached instances and points the state that
+        depends on the current view (URL field, upload file list) at them.
+
+        Args:
+            e: The event object (not used).
+        """
+        # A dialog still waiting for its close belongs to the view being left: it is closed by this update
+        self.cancel_dialog_closes()
+        self.page.views.clear()
+        self.page.views.append(self.get_view("/"))
+
+        route = self.page.route
+        view = self.get_view(route) if route != "/" else None
+        if view is not None:
+            self.page.views.append(view)
+            if route in self.url_fields:
+                self.txt_url = self.url_fields[route]
+            if route in self.upload_refs:
+                self.files, self.upload_button, self.upload_summary = self.upload_refs[route]
         self.page.update()
 
     def view_pop(self, e=None):
@@ -729,6 +1002,91 @@ class FrontEnd:
         self.make_playlist_upload_request(self.txt_url.value)
         print("DONE")
 
+    def get_bulk_controls(self, route, endpoint, payload_key, id_func):
+        """
+        Get the bulk submission controls of a URL view, creating them on first use so their state survives
+        navigation: a multi-line URL field, a button dispatching every URL and a per-URL status table.
+
+        Args:
+            route (str): The route of the view.
+            endpoint (str): The endpoint the URLs are sent to, UPLOAD_AUDIO or UPLOAD_PLAYLIST.
+            payload_key (str): The JSON key of the URL in the request data.
+            id_func (callable): get_video_id or get_playlist_id, used to validate and deduplicate the URLs.
+
+        Returns:
+            list: The controls.
+        """
+        controls = self.bulk_controls.get(route)
+        if controls is None:
+            urls_field = TextField(label="Bulk URLs, one per line", multiline=True, min_lines=3, max_lines=10)
+            table = DataTable(columns=[DataColumn(Text("URL")), DataColumn(Text("Status"))], rows=[])
+            controls = [
+                urls_field,
+                create_button(
+                    "Submit all",
+                    lambda _: self.submit_bulk(urls_field.value, table, endpoint, payload_key, id_func),
+                    icons.PLAYLIST_ADD
+                ),
+                table
+            ]
+            self.bulk_controls[route] = controls
+        return controls
+
+    def submit_bulk(self, text, table, endpoint, payload_key, id_func):
+        """
+        Validate and deduplicate a list of URLs, then dispatch each of them on the "bulk" job queue.
+
+        The concurrency of the dispatch is the size of that queue, set by JOBS_BULK_WORKERS.
+
+        Args:
+            text (str): One URL per line.
+            table (DataTable): The status table to fill.
+            endpoint (str): The endpoint the URLs are sent to.
+            payload_key (str): The JSON key of the URL in the request data.
+            id_func (callable): get_video_id or get_playlist_id.
+        """
+        links, invalid_links = parse_url_list(text, id_func)
+        table.rows.clear()
+        for link in invalid_links:
+            table.rows.append(DataRow(cells=[DataCell(Text(link)), DataCell(Text("invalid URL"))]))
+
+        for link in links:
+            status_text = Text("queued")
+            table.rows.append(DataRow(cells=[DataCell(Text(link)), DataCell(status_text)]))
+            self.bulk_jobs.submit(
+                "bulk",
+                link,
+                lambda job: self.run_sticky_job(
+                    job,
+                    lambda: self.run_bulk_upload(endpoint, {payload_key: job.description})
+                ),
+                self.create_bulk_status_listener(status_text)
+            )
+        request_update(self.page, table)
+
+    def create_bulk_status_listener(self, status_text):
+        def on_job_change(job):
+            if job.state == DONE:
+                status_text.value = "uploaded"
+            elif job.error is not None:
+                status_text.value = job.error
+            else:
+                status_text.value = job.state
+            if status_text.page is not None:  # The user may have navigated away from the table
+                status_text.update()
+
+        return on_job_change
+
+    def run_bulk_upload(self, endpoint, request_data):
+        response = self.post_upload_request(endpoint, request_data)
+        if response is None:
+            raise RuntimeError("failed: the backend could not be reached")
+        elif response.status_code == 401:
+            raise RuntimeError("unauthorized: refresh your YouTube Music token")
+        elif response.status_code != 200:
+            raise RuntimeError("failed: the server responded " + str(response.status_code))
+        return response
+
     def submit_registration(self, e=None):
         print("HERE WE SUBMIT THE RETGISTRATION INFO")
         self.make_post_user_register_request(self.email, self.password)
@@ -736,21 +1094,138 @@ class FrontEnd:
 
     def download_audio(self, e):
         """
+        Enqueue a background job downloading the entered audio URL.
 
-
-        :return:
+        Args:
+            e: The event object (not used).
         """
-        self.make_download_audio_request(self.txt_url.value)
+        self.submit_download_job("audio", self.txt_url.value, self.make_download_audio_request)
 
     def download_playlist(self, e):
-        self.make_download_playlist_request(self.txt_url.value)
+        """
+        Enqueue a background job downloading the entered playlist URL.
+
+        Args:
+            e: The event object (not used).
+        """
+        self.submit_download_job("playlist", self.txt_url.value, self.make_download_playlist_request)
+
+    def create_job_row(self, kind, link):
+        """
+        Create the job list row of a download job.
+
+        Args:
+            kind (str): The kind of download, "audio" or "playlist".
+            link (str): The requested URL.
+
+        Returns:
+            tuple: The Row and the listener that keeps it up to date with the job.
+        """
+        bar = ProgressBar(value=0, width=200)
+        state_text = Text("queued")
+        row = Row([bar, Text(kind + ": " + link), state_text])
+        job_list = self.job_lists[kind]
+
+        def on_job_change(job):
+            row.data = job
+            bar.value = job.progress
+            state_text.value = job.state if job.error is None else job.state + ": " + job.error
+            if job.is_finished() and self.trim_job_list(job_list):
+                if job_list.page is not None:
+                    request_update(self.page, job_list)
+            elif row.page is not None:  # The user may have navigated away from the job list
+                row.update()
+
+        return row, on_job_change
+
+    def trim_job_list(self, job_list):
+        """
+        Drop the oldest finished rows of a job list beyond MAX_FINISHED_JOB_ROWS. Rows of unfinished jobs are kept.
+
+        Args:
+            job_list (Column): The job list, newest row first.
+
+        Returns:
+            bool: Whether rows were dropped.
+        """
+        with self.job_lists_lock:
+            finished = [row for row in job_list.controls if row.data is not None and row.data.is_finished()]
+            dropped = set(map(id, finished[MAX_FINISHED_JOB_ROWS:]))
+            if dropped:
+                job_list.controls = [row for row in job_list.controls if id(row) not in dropped]
+            return bool(dropped)
+
+    def submit_download_job(self, kind, link, request_func):
+        """
+        Enqueue a download job and add its row on top of the job list.
+
+        Args:
+            kind (str): The kind of download, "audio" or "playlist".
+            link (str): The requested URL.
+            request_func (callable): The make_download_*_request method doing the download.
+
+        Returns:
+            Job: The queued job.
+        """
+        row, on_job_change = self.create_job_row(kind, link)
+        job_list = self.job_lists[kind]
+        with self.job_lists_lock:
+            job_list.controls.insert(0, row)
+        self.trim_job_list(job_list)
+        request_update(self.page, job_list)
+        return self.download_jobs.submit(
+            kind,
+            link,
+            lambda job: self.run_download_job(job, request_func),
+            on_job_change
+        )
+
+    def run_sticky_job(self, job, func, key=None):
+        """
+        Run a job whose backend requests must all go to the same backend.
+
+        Args:
+            job (Job): The running job.
+            func (callable): The work of the job, without arguments.
+            key (optional): The sticky key, shared by the jobs that must go to the same backend. The job id by default.
+
+        Returns:
+            The return value of func.
+        """
+        with self.backend.sticky(job.id if key is None else key):
+            return func()
+
+    def run_download_job(self, job, request_func):
+        try:
+            url = self.run_sticky_job(job, lambda: request_func(job.description, job.set_progress))
+        except BackendUnavailableError as e:
+            # Raised again, so the job row reports the backend as unavailable rather than a failed download
+            self.show_error_dialog("Backend unavailable", str(e))
+            raise
+        if url is None:
+            raise RuntimeError("download failed")
+        return url
 
     def upload_audio(self):
         self.make_audio_file_upload_request()
 
-    def upload_playlist(self):
-        self.make_playlist_file_upload_request(self.file_picker)
+    def post_upload_request(self, endpoint, request_data):
+        """
+        Make a POST request to an upload endpoint. Concurrent identical requests from any session share one call.
+
+        Args:
+            endpoint (str): The endpoint, UPLOAD_AUDIO or UPLOAD_PLAYLIST.
+            request_data (dict): The JSON data of the request.
 
+        Returns:
+            Response or None: The response if the request is successful, None otherwise.
+        """
+        return self.in_flight.do(
+            request_key(endpoint, request_data),
+            lambda: self.backend.post_json(endpoint, request_data)
+        )
+
+    @backend_call
     def make_audio_upload_request(self, link):
         """
         Make a POST request to upload an audio file.
@@ -761,10 +1236,7 @@ class FrontEnd:
         print("MAKE AUDIO UPLOAD REQUEST")
         request_data = {"audio_url": link}
         print("the request data:\n", request_data)
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/uploadAudio',
-            request_data
-        )
+        response = self.post_upload_request(UPLOAD_AUDIO, request_data)
         print("RESPONSE:\t", response)
         if response is None:
             # If the request failed, show an error dialog
@@ -783,6 +1255,7 @@ class FrontEnd:
         else:
             self.show_error_dialog("Error", "The server responded:\t" + str(response.status_code))
 
+    @backend_call
     def make_playlist_upload_request(self, link):
         """
         Make a POST request to upload a playlist.
@@ -793,10 +1266,7 @@ class FrontEnd:
         print("MAKE AUDIO UPLOAD REQUEST")
         request_data = {"playlist_url": link}
         print("the request data:\n", request_data)
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/uploadPlaylist',
-            request_data
-        )
+        response = self.post_upload_request(UPLOAD_PLAYLIST, request_data)
         print("RESPONSE:\t", response)
         if response is None:
             # If the request failed, show an error dialog
@@ -814,177 +1284,465 @@ class FrontEnd:
         else:
             self.show_error_dialog("Error", "There server responded:\t" + str(response.status_code))
 
-    def make_download_audio_request(self, link):
+    def fetch_download(self, endpoint, cache_key, request_data, progress=None):
         """
-        Make a POST request to download an audio.
+        Download a file from the backend into assets/uploads, or take it from the download cache.
+
+        Concurrent calls for the same download, from any session, share a single backend request.
 
         Args:
-            link (str): The playlist URL to upload (not implemented).
+            endpoint (str): The download endpoint, DOWNLOAD_AUDIO or DOWNLOAD_PLAYLIST.
+            cache_key (str or None): The download cache key of the requested URL.
+            request_data (dict): The JSON data of the request.
+            progress (callable, optional): Called with (bytes written, total bytes or None) while downloading.
+
+        Returns:
+            tuple: The file name inside assets/uploads (None if the download failed) and the status code of the
+                backend (None if it could not be reached).
         """
-        print("MAKE AUDIO DOWNLOAD REQUEST")
-        request_data = {"audio_url": link}
+        file_name = self.download_cache.get(cache_key)
+        if file_name is not None:
+            return file_name, 200
+        if cache_key is not None:
+            # Downloaded by another process, or before a restart emptied the in-memory cache
+            entry = self.library.find_by_cache_key(cache_key)
+            if entry is not None:
+                self.download_cache.put(cache_key, entry["file_name"])
+                return entry["file_name"], 200
+
         print("the request data:\n", request_data)
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/downloadAudio',
-            request_data)
+        return self.in_flight.do(
+            request_key(endpoint, cache_key if cache_key is not None else request_data),
+            lambda: self._fetch_download(endpoint, cache_key, request_data, progress)
+        )
+
+    def _fetch_download(self, endpoint, cache_key, request_data, progress):
+        response = self.backend.post_json(endpoint, request_data, stream=True)
         print("RESPONSE:\t", response)
         if response is None:
-            # If the request failed, show an error dialog
-            self.show_error_dialog("Error", "Failed to download audio.")
-        elif response.status_code == 200:
-            #  TODO: Success dialog with a custom message
-            print(200)
-            self.show_simple_alert_dialog("Audio downloaded!", "Success.", True, 10)
-            data = response.content
-            file_name = uuid.uuid4()
-            with open("assets/uploads/" + str(file_name), 'wb') as s:
-                s.write(data)
-
-            url = "http://" + self.self_host_address + ":" + self.self_host_port + "/assets/uploads/" + str(file_name)
-            self.page.launch_url(url)
-        elif response.status_code == 401:
-            # If the request failed, show an error dialog
-            self.show_error_dialog("Unauthorized",
-                                   "The audio was not downloaded")
-        else:
-            self.show_error_dialog("Error", "There server responded:\t" + str(response.status_code))
+            return None, None
+        if response.status_code != 200:
+            response.close()
+            return None, response.status_code
+
+        digest = hashlib.sha256()
+        try:
+            file_name = save_response(response, progress=progress, digest=digest)
+        except requests.exceptions.RequestException as e:
+            # The backend dropped the body after the headers; its circuit breaker counted the failure
+            print("Download stream failed:", e)
+            return None, None
+        title, artist = get_response_metadata(response)
+        self.library.record(
+            file_name,
+            DOWNLOAD,
+            os.path.getsize(get_upload_path(file_name)),
+            content_hash=digest.hexdigest(),
+            source_url=request_data.get("audio_url", request_data.get("playlist_url")),
+            cache_key=cache_key,
+            title=title,
+            artist=artist
+        )
+        self.download_cache.put(cache_key, file_name)
+        return file_name, response.status_code
 
-    def make_download_playlist_request(self, link):
+    def make_download_audio_request(self, link, progress=None):
         """
-        Make a POST request to download a playlist.
+        Make a POST request to download an audio, unless it is already in the download cache.
 
         Args:
-            link (str): The playlist URL to upload (not implemented).
+            link (str): The audio URL to download.
+            progress (callable, optional): Called with (bytes written, total bytes or None) while downloading.
+
+        Returns:
+            str or None: The URL of the downloaded file if the download is successful, None otherwise.
+
+        Raises:
+            BackendUnavailableError: If no backend is available, see run_download_job.
+        """
+        print("MAKE AUDIO DOWNLOAD REQUEST")
+        file_name, status_code = self.fetch_download(
+            DOWNLOAD_AUDIO,
+            audio_cache_key(link),
+            {"audio_url": link},
+            progress
+        )
+        if file_name is None:
+            if status_code is None:
+                # If the request failed, show an error dialog
+                self.show_error_dialog("Error", "Failed to download audio.")
+            elif status_code == 401:
+                self.show_error_dialog("Unauthorized",
+                                       "The audio was not downloaded")
+            else:
+                self.show_error_dialog("Error", "There server responded:\t" + str(status_code))
+            return None
+
+        self.show_library_entry(file_name)
+        url = self.get_file_url(file_name)
+        self.page.launch_url(url)
+        self.show_simple_alert_dialog("Audio downloaded!", "Success.", True, 10)
+        return url
+
+    def make_download_playlist_request(self, link, progress=None):
+        """
+        Make a POST request to download a playlist, unless it is already in the download cache.
+
+        Args:
+            link (str): The playlist URL to download.
+            progress (callable, optional): Called with (bytes written, total bytes or None) while downloading.
+
+        Returns:
+            str or None: The URL of the downloaded file if the download is successful, None otherwise.
+
+        Raises:
+            BackendUnavailableError: If no backend is available, see run_download_job.
         """
         print("MAKE PLAYLIST DOWNLOAD REQUEST")
-        request_data = {"playlist_url": link}
-        print("the request data:\n", request_data)
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/downloadPlaylist',
-            request_data)
-        print("RESPONSE:\t", response)
-        if response is None:
-            # If the request failed, show an error dialog
-            self.show_error_dialog("Error", "Failed to download playlist.")
-        elif response.status_code == 200:
-            #  TODO: Success dialog with a custom message
-            print(200)
-            self.show_simple_alert_dialog("Playlist downloaded!", "Success.", True, 10)
-            data = response.content
-            file_name = uuid.uuid4()
-            with open("assets/uploads/" + str(file_name), 'wb') as s:
-                s.write(data)
-
-            url = "http://" + self.self_host_address + ":" + self.self_host_port + "/assets/uploads/" + str(file_name)
-            self.page.launch_url(url)
-        elif response.status_code == 401:
-            # If the request failed, show an error dialog
-            self.show_error_dialog("Unauthorized",
-                                   "The playlist was not downloaded")
-        else:
-            self.show_error_dialog("Error", "There server responded:\t" + str(response.status_code))
+        file_name, status_code = self.fetch_download(
+            DOWNLOAD_PLAYLIST,
+            playlist_cache_key(link),
+            {"playlist_url": link},
+            progress
+        )
+        if file_name is None:
+            if status_code is None:
+                # If the request failed, show an error dialog
+                self.show_error_dialog("Error", "Failed to download playlist.")
+            elif status_code == 401:
+                self.show_error_dialog("Unauthorized",
+                                       "The playlist was not downloaded")
+            else:
+                self.show_error_dialog("Error", "There server responded:\t" + str(status_code))
+            return None
+
+        self.show_library_entry(file_name)
+        url = self.get_file_url(file_name)
+        self.page.launch_url(url)
+        self.show_simple_alert_dialog("Playlist downloaded!", "Success.", True, 10)
+        return url
+
+    def get_file_url(self, file_name):
+        """
+        Build the URL the browser downloads a file of assets/uploads from.
+
+        The file is served by the side server, which supports byte ranges (seeking in the audio player) and
+        conditional requests, unlike the static handler of Flet.
+
+        Args:
+            file_name (str): The file name inside assets/uploads.
+
+        Returns:
+            str: The URL of the file.
+        """
+        return self.get_side_server_url() + FILES_PREFIX + quote(file_name)
+
+    def get_side_server_url(self):
+        """
+        Returns:
+            str: The URL browsers reach the side server at: SIDE_SERVER_PUBLIC_URL when set, for a side server
+                behind a proxy, otherwise this host on the side server port.
+        """
+        if SIDE_SERVER_PUBLIC_URL:
+            return SIDE_SERVER_PUBLIC_URL.rstrip("/")
+        return "http://" + self.self_host_address + ":" + str(SIDE_SERVER_PORT)
+
+    def show_library_entry(self, file_name):
+        """
+        Show a file just recorded in the library index in the library view of this session, if it was opened.
 
-    def make_audio_file_upload_request(self, file_picker_upload_file):
-        url = 'http://' + self.host_address + ':' + self.host_port + '/api/global/uploadReceivedAudio'
-        file_path = 'assets/uploads/' + file_picker_upload_file.name
-        with open(file_path, 'rb') as f:
-            r1 = {file_picker_upload_file.name: f}
-            response = make_post_file_request(
-                url,
-                r1
+        Args:
+            file_name (str): The file name inside assets/uploads.
+        """
+        if self.library_list is not None:
+            self.library_list.show_entry(file_name)
+
+    def make_audio_file_upload_request(self, file_name):
+        """
+        Make a POST request forwarding an uploaded file of assets/uploads to the backend.
+
+        Args:
+            file_name (str): The name of the uploaded file.
+
+        Returns:
+            Response: The response of the backend.
+        """
+        index_uploaded_file(file_name)
+        self.show_library_entry(file_name)
+        with pinned(file_name) as file_path, open(file_path, 'rb') as f:
+            response = self.backend.post_file_stream(
+                UPLOAD_RECEIVED_AUDIO,
+                file_name,
+                file_name,
+                f,
+                os.fstat(f.fileno()).st_size
             )
         print("THE RESPONSE:")
         print(response)
+        if response is None:
+            raise RuntimeError("the backend did not accept the file")
+        return response
 
-    def make_playlist_file_upload_request(self, files):
-        pass
+    def make_playlist_file_upload_request(self, file_name, state_text=None, track_list=None):
+        """
+        Ingest an uploaded playlist archive of assets/uploads, without extracting it.
 
-    def make_post_user_register_request(self):
-        data = {"email": self.email.data, "password": self.password.data}
+        The archive is read entry by entry. Every valid audio track is streamed to the backend by its own job on the
+        "uploads" queue, so at most as many tracks as the queue has workers are sent at once.
 
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/signup',
-            data
-        )
-        if response == 201:
-            print("RESPONSE is 201!! USER REGISTERED")
-            # snack.open = True
+        Args:
+            file_name (str): The name of the uploaded archive.
+            state_text (Text, optional): Receives the progress of the whole playlist.
+            track_list (Column, optional): Receives a result row per entry of the archive.
 
-            self.page.update()
-        else:
-            self.show_error_dialog("UNREGISTERED", "You were not registered! Try again.")
-            self.page.update()
+        Returns:
+            list: The jobs uploading the tracks.
+        """
+        with pinned(file_name) as file_path:
+            index_uploaded_file(file_name)
+            self.show_library_entry(file_name)
+            try:
+                tracks, rejected = list_tracks(file_path)
+            except zipfile.BadZipFile:
+                raise RuntimeError("not a valid zip archive")
+        if not tracks:
+            raise RuntimeError("no audio track in the archive")
+
+        rows = [Row([Text(get_track_name(entry_name)), Text("rejected: " + reason)]) for entry_name, reason in rejected]
+        track_states = [Text("queued") for _ in tracks]
+        rows += [Row([Text(get_track_name(entry.filename)), track_state])
+                 for entry, track_state in zip(tracks, track_states)]
+        if track_list is not None:
+            track_list.controls.extend(rows)
+            if track_list.page is not None:
+                request_update(self.page, track_list)
+
+        finished = {"done": 0, "failed": 0}
+        finished_lock = threading.Lock()
+
+        def create_track_listener(track_state):
+            def on_job_change(job):
+                track_state.value = job.state if job.error is None else job.state + ": " + job.error
+                if track_state.page is not None:
+                    track_state.update()
+                if not job.is_finished():
+                    return
+
+                with finished_lock:
+                    finished["done" if job.state == DONE else "failed"] += 1
+                    done, failed = finished["done"], finished["failed"]
+                if state_text is not None:
+                    state_text.value = str(done) + "/" + str(len(tracks)) + " tracks uploaded"
+                    if failed:
+                        state_text.value += ", " + str(failed) + " failed"
+                    if state_text.page is not None:
+                        state_text.update()
+                if done + failed == len(tracks):
+                    self.backend.drop_sticky(file_name)
+                    if failed:
+                        self.show_error_dialog(
+                            "Playlist partially uploaded",
+                            str(failed) + " of the " + str(len(tracks)) + " tracks of " + file_name +
+                            " could not be uploaded."
+                        )
+                    else:
+                        self.increment_uploaded_files_count()
+
+            return on_job_change
+
+        # The whole playlist goes to one backend, like a resumable archive: the tracks share the archive as sticky key,
+        # held until the last of them finishes so the backend is kept while the others wait in the queue
+        self.backend.hold_sticky(file_name)
+        jobs = []
+        for entry, track_state in zip(tracks, track_states):
+            pin(file_name)  # Released by the track job, so the janitor keeps the archive until every track is sent
+            jobs.append(self.upload_jobs.submit(
+                "track",
+                entry.filename,
+                lambda job: self.run_sticky_job(
+                    job,
+                    lambda: self.upload_playlist_track(file_name, job.description),
+                    key=file_name
+                ),
+                create_track_listener(track_state)
+            ))
+        return jobs
 
-    def make_post_user_login_request(self):
+    def upload_playlist_track(self, file_name, entry_name):
+        """
+        Stream one track of an uploaded playlist archive to the backend, and release the pin its job holds.
 
-        data = {"email": self.email.data, "password": self.password.data}
+        Args:
+            file_name (str): The name of the uploaded archive, pinned once for this track.
+            entry_name (str): The name of the track inside the archive.
 
-        response = make_post_request(
-            'http://' + self.host_address + ':' + self.host_port + '/api/global/login',
-            data
-        )
-        if response == 201:
-            print("LOGIN: RESPONSE is 201!!")
-            self.enable_login_status()
-
-            print("HERE WE LOAD THE VIEW OF THE LOGGED USER")
-            self.page.append(
-                View(
-                    f"/{self.email}",
-                    horizontal_alignment="center",
-                    vertical_alignment="center",
-                    controls=[
-                        Column(
-                            alignment="center",
-                            horizontal_alignment="center",
-                            controls=[
-                                Text(
-                                    "Successfully Logged In!",
-                                    size=44,
-                                    weight="w700",
-                                    text_align="center"
-                                ),
-                                Text(
-                                    f"Login Information:\nEmail: {self.email}\nPassword: {self.password}",
-                                    size=32,
-                                    weight="w500",
-                                    text_align="center"
-                                )
-                            ]
-                        )
-                    ]
+        Returns:
+            Response: The response of the backend.
+        """
+        try:
+            return upload_track(self.backend, get_upload_path(file_name), entry_name)
+        finally:
+            unpin(file_name)
+
+    @backend_call
+    def make_post_user_register_request(self):
+        with batched_update(self.page):
+            data = {"email": self.email.data, "password": self.password.data}
+
+            response = self.backend.post_json(SIGNUP, data)
+            if response == 201:
+                print("RESPONSE is 201!! USER REGISTERED")
+                # snack.open = True
+
+                request_update(self.page)
+            else:
+                self.show_error_dialog("UNREGISTERED", "You were not registered! Try again.")
+                request_update(self.page)
+
+    @backend_call
+    def make_post_user_login_request(self):
+        with batched_update(self.page):
+            data = {"email": self.email.data, "password": self.password.data}
+
+            response = self.backend.post_json(LOGIN, data)
+            if response == 201:
+                print("LOGIN: RESPONSE is 201!!")
+                self.enable_login_status()
+
+                print("HERE WE LOAD THE VIEW OF THE LOGGED USER")
+                self.page.append(
+                    View(
+                        f"/{self.email}",
+                        horizontal_alignment="center",
+                        vertical_alignment="center",
+                        controls=[
+                            Column(
+                                alignment="center",
+                                horizontal_alignment="center",
+                                controls=[
+                                    Text(
+                                        "Successfully Logged In!",
+                                        size=44,
+                                        weight="w700",
+                                        text_align="center"
+                                    ),
+                                    Text(
+                                        f"Login Information:\nEmail: {self.email}\nPassword: {self.password}",
+                                        size=32,
+                                        weight="w500",
+                                        text_align="center"
+                                    )
+                                ]
+                            )
+                        ]
+                    )
                 )
-            )
 
-            self.page.update()
-        else:
-            print("You were not registered! Try again.")
-            self.show_error_dialog("UNREGISTERED", "You were not registered! Try again.")
-            self.page.update()
+                request_update(self.page)
+            else:
+                print("You were not registered! Try again.")
+                self.show_error_dialog("UNREGISTERED", "You were not registered! Try again.")
+                request_update(self.page)
 
 
-def main(page: Page):
+def get_backend_address():
+    """
+    Read the address of the backend from the environment.
+
+    Returns:
+        tuple: The BACKEND_HOST and BACKEND_PORT, 127.0.0.1 and 5000 by default.
+    """
     host_address = os.environ.get("BACKEND_HOST")
     host_port = os.environ.get("BACKEND_PORT")
 
-    self_host_address = os.environ.get("FRONTEND_HOST")
-    self_host_port = os.environ.get("FRONTEND_PORT")
-
     if host_address is None:
         host_address = "127.0.0.1"
 
     if host_port is None:
         host_port = "5000"
 
+    return host_address, host_port
+
+
+def get_backend_targets(host_address, host_port):
+    """
+    Read the backends to send the requests to from the environment.
+
+    Args:
+        host_address (str): The host of the single backend, see get_backend_address.
+        host_port (str): The port of the single backend.
+
+    Returns:
+        list: The (host, port) tuples of BACKEND_HOSTS, a comma separated host:port list of backends to balance
+            over, or else the single host_address:host_port backend.
+    """
+    backend_hosts = os.environ.get("BACKEND_HOSTS")
+    if backend_hosts:
+        return parse_backend_targets(backend_hosts)
+    return [(host_address, host_port)]
+
+
+def forward_completed_upload(file_name, original_name=None):
+    """
+    Forward a file completed by a resumable upload to the backend. Playlist archives are sent track by track.
+
+    Args:
+        file_name (str): The name of the file inside assets/uploads.
+        original_name (str, optional): The name of the file on the computer of the uploader.
+
+    Raises:
+        RuntimeError: If the backend did not accept the file or some of its tracks.
+    """
+    backend = get_backend_pool(get_backend_targets(*get_backend_address()))
+    with pinned(file_name) as file_path, backend.sticky(file_name):
+        index_uploaded_file(file_name, original_name)
+        if not file_name.lower().endswith(".zip"):
+            with open(file_path, 'rb') as f:
+                response = backend.post_file_stream(
+                    UPLOAD_RECEIVED_AUDIO,
+                    file_name,
+                    original_name or file_name,
+                    f,
+                    os.fstat(f.fileno()).st_size
+                )
+            if response is None:
+                raise RuntimeError("the backend did not accept the file")
+            return
+
+        try:
+            tracks, _ = list_tracks(file_path)
+        except zipfile.BadZipFile:
+            raise RuntimeError("not a valid zip archive")
+        if not tracks:
+            raise RuntimeError("no audio track in the archive")
+        failed = 0
+        for entry in tracks:
+            try:
+                upload_track(backend, file_path, entry.filename)
+            except Exception as e:
+                print("Track", entry.filename, "of", file_name, "was not uploaded:", e)
+                failed += 1
+        if failed:
+            raise RuntimeError(str(failed) + " of the " + str(len(tracks)) + " tracks could not be uploaded")
+
+
+def main(page: Page):
+    host_address, host_port = get_backend_address()
+
+    self_host_address = os.environ.get("FRONTEND_HOST")
+
     if self_host_address is None:
         self_host_address = "127.0.0.1"
 
-    if self_host_port is None:
-        self_host_port = "5010"
-
-    frontend = FrontEnd(page, host_address, host_port, self_host_address, self_host_port)
+    frontend = FrontEnd(page, host_address, host_port, self_host_address,
+                        get_backend_targets(host_address, host_port))
     page.go(page.route)
 
 
 if __name__ == '__main__':
+    start_janitor()
+    register_route("GET", "/metrics", serve_metrics)
+    register_resumable_upload_routes(forward_completed_upload)
+    register_route("GET", FILES_PREFIX, serve_file)
+    start_side_server()
     app(main, view=AppView.WEB_BROWSER, assets_dir="assets", port=5010, host="0.0.0.0", upload_dir="assets/uploads")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+from circuit_breaker import CircuitBreaker
+from multipart import MultipartFileStream
+from metrics import BACKEND_REQUEST_SECONDS, BACKEND_RESPONSES, REGISTRY, CallbackGauge, TRANSFERRED_BYTES
+
+API_PREFIX = "/api/global/"
+
+UPLOAD_AUDIO = "uploadAudio"
+UPLOAD_PLAYLIST = "uploadPlaylist"
+DOWNLOAD_AUDIO = "downloadAudio"
+DOWNLOAD_PLAYLIST = "downloadPlaylist"
+UPLOAD_RECEIVED_AUDIO = "uploadReceivedAudio"
+SIGNUP = "signup"
+LOGIN = "login"
+
+# (connect timeout, read timeout) in seconds for every /api/global/* endpoint.
+# Downloads wait for the backend to fetch from YouTube before the first byte, so they get a longer read timeout.
+DEFAULT_TIMEOUT = (3.05, 30)
+ENDPOINT_TIMEOUTS = {
+    UPLOAD_AUDIO: (3.05, 120),
+    UPLOAD_PLAYLIST: (3.05, 600),
+    DOWNLOAD_AUDIO: (3.05, 300),
+    DOWNLOAD_PLAYLIST: (3.05, 900),
+    UPLOAD_RECEIVED_AUDIO: (3.05, 300),
+    SIGNUP: (3.05, 10),
+    LOGIN: (3.05, 10),
+}
+
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("BACKEND_POOL_MAXSIZE", "32"))
+
+# Seconds a request waits for a free pooled connection before the backend is reported unavailable
+DEFAULT_POOL_TIMEOUT = float(os.environ.get("BACKEND_POOL_TIMEOUT", "10"))
+
+# Cheap GET used to probe a backend whose circuit is open. Any answer below 500 means it is up again.
+HEALTH_PATH = os.environ.get("BACKEND_HEALTH_PATH", "/")
+HEALTH_TIMEOUT = (1, 2)
+
+
+class BackendUnavailableError(Exception):
+    """
+    Raised instead of sending a request while the circuit breaker of the backend is open, or when no pooled
+    connection to it frees up in time.
+    """
+
+
+class _BoundedWaitMixin:
+    # requests never passes a pool_timeout to urllib3, so a blocking pool would otherwise wait forever
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(timeout=DEFAULT_POOL_TIMEOUT if timeout is None else timeout)
+
+
+class _BoundedWaitHTTPConnectionPool(_BoundedWaitMixin, HTTPConnectionPool):
+    pass
+
+
+class _BoundedWaitHTTPSConnectionPool(_BoundedWaitMixin, HTTPSConnectionPool):
+    pass
+
+
+class BoundedWaitAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools block for a free connection for at most DEFAULT_POOL_TIMEOUT seconds, then
+    raise urllib3.exceptions.EmptyPoolError.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(pool_block=True, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _BoundedWaitHTTPConnectionPool,
+            "https": _BoundedWaitHTTPSConnectionPool,
+        }
+
+
+class BackendClient:
+    """
+    Keep-alive HTTP client for the ytm-offline backend.
+
+    A single instance is shared by every FrontEnd session of the process, so all of them reuse the same bounded
+    pool of TCP connections instead of opening a new one per request.
+    """
+
+    def __init__(self, host_address, host_port, pool_maxsize=DEFAULT_POOL_MAXSIZE, timeouts=None):
+        """
+        Args:
+            host_address (str): The backend host.
+            host_port (str): The backend port.
+            pool_maxsize (int, optional): The maximum number of keep-alive connections to the backend.
+            timeouts (dict, optional): Per-endpoint (connect, read) timeouts overriding ENDPOINT_TIMEOUTS.
+        """
+        self.host_address = host_address
+        self.host_port = str(host_port)
+        self.base_url = "http://" + self.host_address + ":" + self.host_port
+
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts is not None:
+            self.timeouts.update(timeouts)
+
+        # Extra threads wait for a free connection instead of opening throwaway ones, up to DEFAULT_POOL_TIMEOUT
+        adapter = BoundedWaitAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.breaker = CircuitBreaker(self.check_health)
+
+    def build_url(self, endpoint):
+        """
+        Build the URL of an /api/global/* endpoint.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "uploadAudio".
+
+        Returns:
+            str: The absolute URL of the endpoint.
+        """
+        return self.base_url + API_PREFIX + endpoint
+
+    def get_timeout(self, endpoint):
+        return self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+
+    def check_health(self):
+        """
+        Probe the backend with a cheap GET request.
+
+        Returns:
+            bool: True if the backend answered without a server error.
+        """
+        try:
+            response = self.session.get(self.base_url + HEALTH_PATH, timeout=HEALTH_TIMEOUT)
+            response.close()
+            return response.status_code < 500
+        except requests.exceptions.RequestException as e:
+            print("Backend health check failed:", e)
+            return False
+
+    def _post(self, endpoint, **kwargs):
+        if not self.breaker.allow():
+            BACKEND_RESPONSES.inc(1, endpoint, "circuit_open")
+            raise BackendUnavailableError(
+                "The backend at " + self.host_address + ":" + self.host_port + " is unavailable. "
+                "Please try again in a few seconds."
+            )
+
+        start = time.perf_counter()
+        status = "error"
+        failed = True
+        watched = False
+        try:
+            response = self.session.post(self.build_url(endpoint), timeout=self.get_timeout(endpoint), **kwargs)
+            status = str(response.status_code)
+            # Client errors (4xx) come from a healthy backend and do not count against it
+            failed = response.status_code >= 500
+            response.raise_for_status()  # Raise an exception for HTTP errors (non-2xx status codes)
+            if kwargs.get("stream"):
+                self._watch_stream(response)
+                watched = True
+            return response
+        except EmptyPoolError:
+            # Every connection is busy, e.g. with long downloads: not a failure of the backend itself
+            failed = False
+            status = "pool_timeout"
+            raise BackendUnavailableError(
+                "The backend at " + self.host_address + ":" + self.host_port + " is busy. "
+                "Please try again in a few seconds."
+            )
+        except requests.exceptions.RequestException as e:
+            if e.response is not None:
+                e.response.close()  # Give a streamed connection back to the pool
+            print("POST request failed:", e)
+            return None
+        finally:
+            if not watched:
+                self.breaker.record(failed)
+            BACKEND_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            BACKEND_RESPONSES.inc(1, endpoint, status)
+
+    def _watch_stream(self, response):
+        """
+        Record the outcome of a streamed response in the circuit breaker once its body is read: a backend can still
+        fail after the headers, by dropping or stalling the body.
+
+        Args:
+            response (Response): A successful response obtained with stream=True.
+        """
+        iter_content = response.iter_content
+        close = response.close
+        recorded = []
+
+        def record(failed):
+            if not recorded:
+                recorded.append(True)
+                self.breaker.record(failed)
+
+        def watched_iter_content(*args, **kwargs):
+            try:
+                yield from iter_content(*args, **kwargs)
+            except requests.exceptions.RequestException:
+                record(True)
+                raise
+            record(False)
+
+        def close_and_record():
+            try:
+                close()
+            finally:
+                # Closed before the end of the body without a read error, e.g. when the disk is full
+                record(False)
+
+        response.iter_content = watched_iter_content
+        response.close = close_and_record
+
+    def post_json(self, endpoint, data, stream=False):
+        """
+        Make a POST request to an endpoint with JSON data.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "uploadAudio".
+            data (dict): The JSON data to include in the request body.
+            stream (bool, optional): Whether to defer downloading the response body.
+
+        Returns:
+            Response or None: The response if the request is successful, None otherwise.
+        """
+        return self._post(endpoint, json=data, stream=stream)
+
+    def post_file(self, endpoint, files):
+        """
+        Make a POST request to an endpoint with multipart file data.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "uploadReceivedAudio".
+            files (dict): The files to send, as accepted by requests.
+
+        Returns:
+            Response or None: The response if the request is successful, None otherwise.
+        """
+        return self._post(endpoint, files=files)
+
+    def post_file_stream(self, endpoint, field_name, file_name, fileobj, size):
+        """
+        Make a POST request to an endpoint with a single-file multipart body streamed from a file object.
+
+        Unlike post_file, the body is never built in memory: it is read from fileobj while it is sent, with a
+        precomputed Content-Length.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "uploadReceivedAudio".
+            field_name (str): The name of the form field.
+            file_name (str): The file name sent to the backend.
+            fileobj (file): The opened binary file to send.
+            size (int): The number of bytes of fileobj to send.
+
+        Returns:
+            Response or None: The response if the request is successful, None otherwise.
+        """
+        body = MultipartFileStream(field_name, file_name, fileobj, size)
+        response = self._post(
+            endpoint,
+            data=body,
+            headers={"Content-Type": body.content_type, "Content-Length": str(len(body))}
+        )
+        if response is not None:
+            TRANSFERRED_BYTES.inc(size, "backend_upload")
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_backend_client(host_address, host_port):
+    """
+    Return the process-wide BackendClient for a backend, creating it on first use.
+
+    Args:
+        host_address (str): The backend host.
+        host_port (str): The backend port.
+
+    Returns:
+        BackendClient: The shared client.
+    """
+    key = (host_address, str(host_port))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = BackendClient(host_address, host_port)
+            _clients[key] = client
+        return client
+
+
+def _collect_circuit_states():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {(client.host_address + ":" + client.host_port,): int(client.breaker.is_open()) for client in clients}
+
+
+REGISTRY.register(CallbackGauge(
+    "ytm_backend_circuit_open",
+    "Whether the circuit breaker of a backend is open (1) or closed (0)",
+    _collect_circuit_states,
+    ("backend",)
+))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import contextlib
+import random
+import threading
+
+from backend_client import get_backend_client, BackendUnavailableError
+from metrics import REGISTRY, CallbackGauge
+
+
+def parse_backend_targets(text):
+    """
+    Parse a comma separated list of backend targets, e.g. "10.0.0.1:5000,10.0.0.2:5000".
+
+    Args:
+        text (str): The list of host:port targets. A target without a port uses port 5000.
+
+    Returns:
+        list: The (host, port) tuples.
+    """
+    targets = []
+    for target in text.split(","):
+        target = target.strip()
+        if not target:
+            continue
+        host, _, port = target.rpartition(":") if ":" in target else (target, "", "5000")
+        targets.append((host, port))
+    return targets
+
+
+class BackendPool:
+    """
+    Route backend calls over several BackendClients, to the one with the fewest outstanding requests.
+
+    A backend whose circuit breaker is open is ejected from the routing until its health probe succeeds. Calls made
+    inside a sticky(key) block, e.g. all the requests of one job, go to the backend the first of them was routed to.
+    Several blocks, on several threads, can share a key: the backend is kept until the last of them ends, or the
+    last hold_sticky(key) is dropped.
+    The pool offers the request methods of BackendClient, so it can be used in its place.
+    """
+
+    def __init__(self, clients):
+        """
+        Args:
+            clients (list): The BackendClients to route over.
+        """
+        self.clients = list(clients)
+        self.outstanding = {client: 0 for client in self.clients}
+        self.sticky_clients = {}
+        self.sticky_holds = {}  # key -> number of sticky blocks and holds using it
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def sticky(self, key):
+        """
+        Make the calls of the current thread stick to one backend while the block runs.
+
+        Args:
+            key: The key of the work the calls belong to, e.g. a job id.
+        """
+        previous_key = getattr(self._local, "sticky_key", None)
+        self.hold_sticky(key)
+        self._local.sticky_key = key
+        try:
+            yield
+        finally:
+            self._local.sticky_key = previous_key
+            self.drop_sticky(key)
+
+    def hold_sticky(self, key):
+        """
+        Keep the backend of a sticky key between its blocks, e.g. while the jobs sharing it wait in a queue.
+        Release it with drop_sticky(key).
+
+        Args:
+            key: The sticky key.
+        """
+        with self._lock:
+            self.sticky_holds[key] = self.sticky_holds.get(key, 0) + 1
+
+    def drop_sticky(self, key):
+        with self._lock:
+            holds = self.sticky_holds.pop(key, 0) - 1
+            if holds > 0:
+                self.sticky_holds[key] = holds
+            else:
+                self.sticky_clients.pop(key, None)
+
+    def choose(self):
+        """
+        Pick the backend of the next call and count it as outstanding. Release it with release(client).
+
+        Returns:
+            BackendClient: The chosen backend.
+
+        Raises:
+            BackendUnavailableError: If the circuit of every backend is open.
+        """
+        sticky_key = getattr(self._local, "sticky_key", None)
+        with self._lock:
+            # Shuffle first so that ties are spread instead of always going to the first backend
+            candidates = random.sample(self.clients, len(self.clients))
+            candidates.sort(key=lambda client: self.outstanding[client])
+            sticky_client = self.sticky_clients.get(sticky_key)
+            if sticky_client is not None:
+                candidates.remove(sticky_client)
+                candidates.insert(0, sticky_client)
+
+        for client in candidates:
+            # Probes an ejected backend once its open period is over; rejects it while it is still open
+            if client.breaker.allow():
+                with self._lock:
+                    self.outstanding[client] += 1
+                    if sticky_key is not None:
+                        self.sticky_clients[sticky_key] = client
+                return client
+
+        raise BackendUnavailableError(
+            "No backend is available (" + ", ".join(client.host_address + ":" + client.host_port
+                                                    for client in self.clients) + "). "
+            "Please try again in a few seconds."
+        )
+
+    def release(self, client):
+        with self._lock:
+            self.outstanding[client] -= 1
+
+    def _call(self, method_name, *args, **kwargs):
+        client = self.choose()
+        response = None
+        try:
+            response = getattr(client, method_name)(*args, **kwargs)
+            return response
+        finally:
+            if response is not None and kwargs.get("stream"):
+                # A streamed body is still being received: the request is outstanding until the response is closed
+                self._release_on_close(response, client)
+            else:
+                self.release(client)
+
+    def _release_on_close(self, response, client):
+        close = response.close
+        released = []
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self.release(client)
+
+        response.close = close_and_release
+
+    def post_json(self, endpoint, data, stream=False):
+        """
+        Make a POST request with JSON data to the least busy backend. See BackendClient.post_json.
+        """
+        return self._call("post_json", endpoint, data, stream=stream)
+
+    def post_file(self, endpoint, files):
+        """
+        Make a POST request with multipart file data to the least busy backend. See BackendClient.post_file.
+        """
+        return self._call("post_file", endpoint, files)
+
+    def post_file_stream(self, endpoint, field_name, file_name, fileobj, size):
+        """
+        Make a POST request with a streamed file to the least busy backend. See BackendClient.post_file_stream.
+        """
+        return self._call("post_file_stream", endpoint, field_name, file_name, fileobj, size)
+
+    def outstanding_requests(self):
+        with self._lock:
+            return {client.host_address + ":" + client.host_port: count for client, count in self.outstanding.items()}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_backend_pool(targets):
+    """
+    Return the process-wide BackendPool for a list of backends, creating it on first use.
+
+    Args:
+        targets (list): The (host, port) tuples of the backends.
+
+    Returns:
+        BackendPool: The shared pool.
+    """
+    key = tuple((host, str(port)) for host, port in targets)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = BackendPool([get_backend_client(host, port) for host, port in key])
+            _pools[key] = pool
+        return pool
+
+
+def _collect_outstanding_requests():
+    with _pools_lock:
+        pools = list(_pools.values())
+    samples = {}
+    for pool in pools:
+        for backend, count in pool.outstanding_requests().items():
+            samples[(backend,)] = samples.get((backend,), 0) + count
+    return samples
+
+
+REGISTRY.register(CallbackGauge(
+    "ytm_backend_outstanding_requests",
+    "Backend requests sent and not yet completed, per backend",
+    _collect_outstanding_requests,
+    ("backend",)
+))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Share of failed calls among the last WINDOW_SIZE calls that opens the circuit
+DEFAULT_FAILURE_RATE = float(os.environ.get("BACKEND_FAILURE_RATE", "0.5"))
+DEFAULT_WINDOW_SIZE = 20
+# The failure rate is not trusted before this many calls
+DEFAULT_MIN_CALLS = 5
+# Seconds the circuit stays open before a health probe may close it again
+DEFAULT_OPEN_SECONDS = float(os.environ.get("BACKEND_OPEN_SECONDS", "10"))
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a backend is failing instead of letting every call wait out its timeout.
+
+    The circuit opens when the failure rate of the recent calls reaches a threshold. While it is open every call
+    is rejected. Once the open period is over, the next caller runs a cheap health check (half-open state): the
+    circuit closes if it succeeds and stays open for another period otherwise.
+    """
+
+    def __init__(self, health_check, failure_rate=DEFAULT_FAILURE_RATE, window_size=DEFAULT_WINDOW_SIZE,
+                 min_calls=DEFAULT_MIN_CALLS, open_seconds=DEFAULT_OPEN_SECONDS):
+        """
+        Args:
+            health_check (callable): Returns True when the backend is healthy. It must be quick to time out.
+            failure_rate (float): The failure rate between 0 and 1 that opens the circuit.
+            window_size (int): The number of recent calls the failure rate is computed over.
+            min_calls (int): The minimum number of recent calls before the circuit can open.
+            open_seconds (float): The seconds between two health probes while the circuit is open.
+        """
+        self.health_check = health_check
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0
+        self.results = deque(maxlen=window_size)  # True for every failed call
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def allow(self):
+        """
+        Tell whether a call may go to the backend now, probing its health when the open period is over.
+
+        Returns:
+            bool: True if the call may proceed, False if it must fail fast.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+
+        # Only one caller probes; the others keep failing fast until the probe is over
+        if not self._probe_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                self.state = HALF_OPEN
+            try:
+                healthy = self.health_check()
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    print("Backend is healthy again, closing the circuit")
+                    self.state = CLOSED
+                    self.results.clear()
+                else:
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+            return healthy
+        finally:
+            self._probe_lock.release()
+
+    def record(self, failed):
+        """
+        Record the outcome of a call that was allowed.
+
+        Args:
+            failed (bool): Whether the call failed because of the backend (connection error, timeout, 5xx).
+        """
+        with self._lock:
+            if self.state != CLOSED:
+                return
+            self.results.append(failed)
+            failures = sum(self.results)
+            if len(self.results) >= self.min_calls and failures / len(self.results) >= self.failure_rate:
+                print("Backend failing (" + str(failures) + "/" + str(len(self.results)) + " calls), "
+                      "opening the circuit")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        with self._lock:
+            return self.state != CLOSED
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+from collections import OrderedDict
+
+from library_index import get_library_index
+from metrics import REGISTRY, CallbackGauge
+from uploads_storage import get_upload_path, is_pinned, notify_removed
+from youtube_urls import get_video_id, get_playlist_id
+
+# Disk budget of the cached downloads in assets/uploads, in bytes
+DEFAULT_MAX_BYTES = int(os.environ.get("DOWNLOAD_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+
+def audio_cache_key(link):
+    """
+    Return the cache key of an audio URL, or None if the URL has no recognizable video id.
+    """
+    video_id = get_video_id(link)
+    return None if video_id is None else "audio:" + video_id
+
+
+def playlist_cache_key(link):
+    """
+    Return the cache key of a playlist URL, or None if the URL has no recognizable playlist id.
+    """
+    playlist_id = get_playlist_id(link)
+    return None if playlist_id is None else "playlist:" + playlist_id
+
+
+class DownloadCache:
+    """
+    Size-bounded LRU index of the files downloaded into assets/uploads, keyed by normalized source URL.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes (int): The disk budget of the cached files. Least recently used files are deleted beyond it.
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (file name, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a cached download.
+
+        Args:
+            key (str or None): The cache key. None always misses.
+
+        Returns:
+            str or None: The file name inside assets/uploads, or None on a miss.
+        """
+        with self._lock:
+            entry = self.entries.get(key) if key is not None else None
+            if entry is not None and not os.path.exists(get_upload_path(entry[0])):
+                # The file was removed behind our back
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, file_name):
+        """
+        Add a downloaded file to the cache, evicting least recently used files over the disk budget. Files in use
+        (pinned) are skipped, so the cache can stay over budget until they are released.
+
+        Args:
+            key (str or None): The cache key. Nothing is cached for None.
+            file_name (str): The file name inside assets/uploads.
+        """
+        if key is None:
+            return
+        size = os.path.getsize(get_upload_path(file_name))
+        if size > self.max_bytes:
+            return
+
+        evicted = []
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (file_name, size)
+            self.total_bytes += size
+            for old_key, (old_file_name, _) in list(self.entries.items()):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                # Pinned files are being read, e.g. streamed to a browser; they are evicted by a later put
+                if old_key == key or is_pinned(old_file_name):
+                    continue
+                evicted.append(old_file_name)
+                self._remove(old_key)
+                self.evictions += 1
+
+        for old_file_name in evicted:
+            try:
+                os.remove(get_upload_path(old_file_name))
+            except FileNotFoundError:
+                pass
+            notify_removed(old_file_name)
+            get_library_index().forget(old_file_name)
+
+    def stats(self):
+        """
+        Returns:
+            dict: The hit/miss/eviction counters and the current size of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key):
+        file_name, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_download_cache():
+    """
+    Return the process-wide DownloadCache, creating it on first use.
+
+    Returns:
+        DownloadCache: The shared cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DownloadCache()
+        return _cache
+
+
+REGISTRY.register(CallbackGauge(
+    "ytm_download_cache",
+    "Download cache counters (hits, misses, evictions) and size (entries, bytes, max_bytes).",
+    lambda: {(name,): value for name, value in get_download_cache().stats().items()},
+    ("stat",)
+))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import email.utils
+import mimetypes
+import os
+import re
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from metrics import TRANSFERRED_BYTES
+from uploads_storage import TEMP_PREFIX, pinned
+
+FILES_PREFIX = "/files/"
+
+# Downloaded files are named by a uuid without extension, so their type is sniffed from their first bytes
+SNIFF_SIZE = 12
+
+# Bytes handed to os.sendfile per call, so a slow client does not hold one huge call
+SENDFILE_CHUNK = 4 * 1024 * 1024
+
+# Extension given to the saved file, as downloaded files have none
+EXTENSIONS = {
+    "application/zip": ".zip",
+    "audio/mpeg": ".mp3",
+    "audio/mp4": ".m4a",
+    "audio/ogg": ".ogg",
+    "audio/flac": ".flac",
+    "audio/wav": ".wav",
+}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def sniff_content_type(header):
+    """
+    Guess the content type of a file from its first bytes.
+
+    Args:
+        header (bytes): The first SNIFF_SIZE bytes of the file.
+
+    Returns:
+        str or None: The content type, None if unknown.
+    """
+    if header.startswith(b"PK\x03\x04") or header.startswith(b"PK\x05\x06"):
+        return "application/zip"
+    if header.startswith(b"ID3") or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if header[4:8] == b"ftyp":
+        return "audio/mp4"
+    if header.startswith(b"OggS"):
+        return "audio/ogg"
+    if header.startswith(b"fLaC"):
+        return "audio/flac"
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return "audio/wav"
+    return None
+
+
+def make_etag(stat):
+    # Files of assets/uploads are never rewritten in place, so size and mtime identify their content
+    return "\"" + format(stat.st_size, "x") + "-" + format(stat.st_mtime_ns, "x") + "\""
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range of a Range header.
+
+    Args:
+        header (str): The value of the Range header.
+        size (int): The size of the file.
+
+    Returns:
+        tuple or None: The (first, last) byte positions, None to send the whole file when the header is invalid
+            or asks for several ranges.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # A suffix range: the last bytes of the file
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = size - 1 if not last else min(int(last), size - 1)
+    if first >= size or first > last:
+        raise ValueError("range outside of the file")
+    return first, last
+
+
+def is_not_modified(request, etag, mtime=None):
+    """
+    Evaluate the If-None-Match, or else If-Modified-Since, header of a request.
+
+    Args:
+        request (BaseHTTPRequestHandler): The request.
+        etag (str): The current ETag of the resource.
+        mtime (float, optional): The modification time of the resource, None to ignore If-Modified-Since.
+
+    Returns:
+        bool: True if the client has the current version and gets a 304.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is not None and mtime is not None:
+        try:
+            return int(mtime) <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _is_range_valid(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    # If-Range holds either a strong ETag or the exact Last-Modified date of the representation the client has
+    return if_range is None or if_range.strip() in (etag, last_modified)
+
+
+def _get_content_disposition(file_name, content_type, force_download):
+    extension = EXTENSIONS.get(content_type)
+    if extension is not None and not file_name.lower().endswith(extension):
+        file_name += extension
+    # Audio opens in the browser player, where it can be seeked; archives are saved
+    disposition = "inline" if content_type.startswith("audio/") and not force_download else "attachment"
+    ascii_name = re.sub(r"[^A-Za-z0-9._ -]", "_", file_name)
+    return disposition + "; filename=\"" + ascii_name + "\"; filename*=UTF-8''" + quote(file_name)
+
+
+def send_file_body(request, f, offset, count):
+    """
+    Send count bytes of a file from offset, with os.sendfile where possible so they never enter Python.
+
+    Args:
+        request (BaseHTTPRequestHandler): The request to answer.
+        f (file): The opened binary file.
+        offset (int): The position of the first byte to send.
+        count (int): The number of bytes to send.
+    """
+    if hasattr(os, "sendfile"):  # Not on Windows
+        socket_fd = request.connection.fileno()
+        while count > 0:
+            sent = os.sendfile(socket_fd, f.fileno(), offset, min(count, SENDFILE_CHUNK))
+            if sent == 0:
+                raise BrokenPipeError("the client closed the connection")
+            offset += sent
+            count -= sent
+            TRANSFERRED_BYTES.inc(sent, "browser_download")
+        return
+
+    f.seek(offset)
+    remaining = count
+    while remaining > 0:
+        data = f.read(min(remaining, 64 * 1024))
+        if not data:
+            break
+        request.wfile.write(data)
+        remaining -= len(data)
+    TRANSFERRED_BYTES.inc(count - remaining, "browser_download")
+
+
+def serve_file(request, path):
+    """
+    Side server handler sending a file of assets/uploads, with byte ranges and conditional requests.
+
+    The file is kept pinned while it is sent, so the janitor cannot delete it under a slow client.
+
+    Args:
+        request (BaseHTTPRequestHandler): The request.
+        path (str): The rest of the path: the URL-encoded file name.
+    """
+    file_name = unquote(path)
+    if not file_name or file_name != os.path.basename(file_name) or file_name.startswith(TEMP_PREFIX) \
+            or file_name.startswith("."):
+        request.send_plain(404, "Not Found")
+        return
+
+    with pinned(file_name) as file_path:
+        try:
+            f = open(file_path, "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            request.send_plain(404, "Not Found")
+            return
+
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = make_etag(stat)
+            last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+            content_type = sniff_content_type(f.read(SNIFF_SIZE)) or mimetypes.guess_type(file_name)[0] \
+                or "application/octet-stream"
+            force_download = "download" in parse_qs(urlsplit(request.path).query, keep_blank_values=True)
+
+            headers = {
+                "ETag": etag,
+                "Last-Modified": last_modified,
+                "Accept-Ranges": "bytes",
+                "Cache-Control": "private, max-age=3600",
+                # The service worker of the app, on the Flet origin, keeps audio files for offline playback
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Expose-Headers": "Content-Length, Content-Range, Content-Disposition, ETag",
+            }
+            if is_not_modified(request, etag, stat.st_mtime):
+                request.send_response(304)
+                for name, value in headers.items():
+                    request.send_header(name, value)
+                request.end_headers()
+                return
+
+            first, last = 0, size - 1
+            status = 200
+            range_header = request.headers.get("Range")
+            if range_header is not None and size > 0 and _is_range_valid(request, etag, last_modified):
+                try:
+                    byte_range = parse_range(range_header, size)
+                except ValueError:
+                    request.send_plain(416, "Range Not Satisfiable", {"Content-Range": "bytes */" + str(size)})
+                    return
+                if byte_range is not None:
+                    first, last = byte_range
+                    status = 206
+                    headers["Content-Range"] = "bytes " + str(first) + "-" + str(last) + "/" + str(size)
+
+            request.send_response(status)
+            request.send_header("Content-Type", content_type)
+            request.send_header("Content-Length", str(last - first + 1))
+            request.send_header("Content-Disposition", _get_content_disposition(file_name, content_type,
+                                                                                force_download))
+            for name, value in headers.items():
+                request.send_header(name, value)
+            request.end_headers()
+            if request.command != "HEAD" and last >= first:
+                send_file_body(request, f, first, last - first + 1)
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import threading
+from contextlib import contextmanager
 from flet import (
     ElevatedButton,
     Text,
@@ -20,16 +22,80 @@ from flet import (
 )
 
 
+_update_batches = threading.local()
+
+
+class _UpdateBatch:
+    def __init__(self):
+        self.depth = 0
+        self.full = False
+        self.controls = []
+
+
+def _get_update_batches():
+    batches = getattr(_update_batches, "batches", None)
+    if batches is None:
+        batches = _update_batches.batches = {}
+    return batches
+
+
+@contextmanager
+def batched_update(page):
+    """
+    Defer the updates requested with request_update inside the with block into a single update at its end.
+
+    Blocks can be nested; only the outermost one sends the update. Batches are per thread, so handlers running
+    at the same time never flush each other's changes.
+
+    Args:
+        page (Page): The page whose updates are batched.
+    """
+    batches = _get_update_batches()
+    batch = batches.get(id(page))
+    if batch is None:
+        batch = batches[id(page)] = _UpdateBatch()
+    batch.depth += 1
+    try:
+        yield batch
+    finally:
+        batch.depth -= 1
+        if batch.depth == 0:
+            del batches[id(page)]
+            if batch.full:
+                page.update()
+            elif batch.controls:
+                page.update(*batch.controls)
+
+
+def request_update(page, *controls):
+    """
+    Update the page, or only some of its controls, right away or at the end of the current batched_update.
+
+    Args:
+        page (Page): The page to update.
+        *controls (Control): The controls to update. The whole page is updated when none is given.
+    """
+    batch = _get_update_batches().get(id(page))
+    if batch is None:
+        page.update(*controls)
+    elif not controls:
+        batch.full = True
+    else:
+        for control in controls:
+            if not any(control is pending for pending in batch.controls):
+                batch.controls.append(control)
+
+
 def open_dlg(page, dlg):
     page.dialog = dlg
     dlg.open = True
-    page.update()
+    request_update(page)
 
 
 def close_dlg(page):
     dlg = page.dialog
     dlg.open = False
-    page.update()
+    request_update(page)
 
 
 def create_switch(label_text, func):
@@ -63,7 +129,7 @@ def create_simple_view(route_path, *controls):
     )
 
 
-def create_custom_view(result, view_path, view_name, view_function):
+def create_custom_view(result, view_path, view_name, view_function, *controls):
     """
     Create a custom view for a specific route.
 
@@ -72,6 +138,7 @@ def create_custom_view(result, view_path, view_name, view_function):
         view_path (str): The route path for the custom view.
         view_name (str): The name of the custom view.
         view_function (callable): The function to execute when the "Submit" button is clicked.
+        *controls (Control): Extra controls shown below the "Submit" button.
 
     Returns:
         View: The custom view.
@@ -85,7 +152,8 @@ def create_custom_view(result, view_path, view_name, view_function):
             ),
             Text("This is the " + view_name + " Page"),
             result,
-            create_button("Submit", view_function)
+            create_button("Submit", view_function),
+            *controls
         ],
     )
 
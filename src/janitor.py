@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from library_index import get_library_index
+from uploads_storage import UPLOADS_DIR, TEMP_PREFIX, add_file_listener, is_pinned
+
+# Files older than this many seconds are deleted
+DEFAULT_MAX_AGE = int(os.environ.get("UPLOADS_MAX_AGE", str(7 * 24 * 3600)))
+
+# Oldest files are deleted while assets/uploads is bigger than this many bytes
+DEFAULT_MAX_BYTES = int(os.environ.get("UPLOADS_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Seconds between two passes over the oldest tracked files
+DEFAULT_INTERVAL = int(os.environ.get("JANITOR_INTERVAL", "300"))
+
+# Seconds between two full walks of the directory, which pick up the files nobody reported
+DEFAULT_RECONCILE_INTERVAL = int(os.environ.get("JANITOR_RECONCILE_INTERVAL", str(24 * 3600)))
+
+# Files modified less than this many seconds ago may still be written or served, so they are never deleted
+GRACE_PERIOD = 600
+
+# Directory entries looked at per step of a full walk, and pause between steps, so it never hogs the disk or the GIL
+BATCH_SIZE = 1000
+BATCH_PAUSE = 0.05
+
+
+class Janitor:
+    """
+    Background thread keeping a directory under a maximum file age and a maximum total size.
+
+    The janitor keeps a map of the files of the directory, oldest first, that the writers update as they add and
+    remove files (see track). Every pass only goes through the oldest files of the map and stops at the first one
+    that is neither expired nor needed to get under the quota, so its cost follows the number of deleted files, not
+    the size of the directory. A candidate is statted once before it is deleted, in case it changed unreported.
+
+    The directory is only walked in full at start and then every reconcile_interval, in batches with a short pause
+    between them, to pick up the files nobody reported and drop those removed behind the back of the janitor.
+    """
+
+    def __init__(self, directory=UPLOADS_DIR, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES,
+                 interval=DEFAULT_INTERVAL, reconcile_interval=DEFAULT_RECONCILE_INTERVAL, on_delete=None):
+        """
+        Args:
+            directory (str): The directory to clean.
+            max_age (int): The maximum age of a file, in seconds.
+            max_bytes (int or None): The maximum total size of the directory, in bytes. None only enforces max_age.
+            interval (int): The seconds between two passes.
+            reconcile_interval (int): The seconds between two full walks of the directory.
+            on_delete (callable, optional): Called with the name of every deleted file.
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.on_delete = on_delete
+        self.files = OrderedDict()  # file name -> (size, mtime), oldest first
+        self.total_bytes = 0
+        self.reconciled_at = None
+        self.reclaimed_bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def track(self, file_name, size, mtime):
+        """
+        Record a file written into the directory, or removed from it. Fits uploads_storage.add_file_listener.
+
+        Args:
+            file_name (str): The name of the file inside the directory.
+            size (int or None): Its size in bytes, None when it was removed.
+            mtime (float or None): Its modification time.
+        """
+        with self._lock:
+            self._untrack(file_name)
+            if size is not None:
+                self.files[file_name] = (size, mtime)
+                self.total_bytes += size
+
+    def _untrack(self, file_name):
+        entry = self.files.pop(file_name, None)
+        if entry is not None:
+            self.total_bytes -= entry[0]
+
+    def reconcile(self):
+        """
+        Walk the whole directory in batches and rebuild the map of its files from what is on disk.
+
+        Returns:
+            bool: False when the janitor was stopped during the walk, leaving the map unchanged.
+        """
+        started = time.time()
+        seen = {}
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            entries = None
+
+        if entries is not None:
+            with entries:
+                for count, entry in enumerate(entries, 1):
+                    if count % BATCH_SIZE == 0:
+                        if self._stop.wait(BATCH_PAUSE):
+                            return False
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    seen[entry.name] = (stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            # Files reported during the walk may have been written after the walk went past them
+            for file_name, (size, mtime) in self.files.items():
+                if file_name not in seen and mtime >= started:
+                    seen[file_name] = (size, mtime)
+            self.files = OrderedDict(sorted(seen.items(), key=lambda item: item[1][1]))
+            self.total_bytes = sum(size for size, _ in self.files.values())
+        self.reconciled_at = started
+        return True
+
+    def sweep(self):
+        """
+        Delete the expired files, then the oldest files while the directory is over its quota.
+
+        Returns:
+            int: The bytes reclaimed by the pass.
+        """
+        now = time.time()
+        candidates = []
+        with self._lock:
+            total = self.total_bytes
+            for file_name, (size, mtime) in self.files.items():
+                over_quota = self.max_bytes is not None and total > self.max_bytes
+                if now - mtime <= self.max_age and not over_quota:
+                    break
+                if self._is_deletable(file_name, mtime, now):
+                    candidates.append((file_name, mtime))
+                    total -= size
+
+        reclaimed = 0
+        for file_name, mtime in candidates:
+            path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime != mtime:
+                    # Written again since it was tracked: it moves to the newest end, to be looked at again later
+                    self.track(file_name, stat.st_size, stat.st_mtime)
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                self.track(file_name, None, None)
+                continue
+            self.track(file_name, None, None)
+            reclaimed += stat.st_size
+            if self.on_delete is not None:
+                self.on_delete(file_name)
+        return reclaimed
+
+    def _is_deletable(self, file_name, mtime, now):
+        if now - mtime < GRACE_PERIOD or is_pinned(file_name):
+            return False
+        # A partial file only lingers when its writer died, otherwise it gets renamed well before max_age
+        return not file_name.startswith(TEMP_PREFIX) or now - mtime > self.max_age
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.reconciled_at is None or time.time() - self.reconciled_at >= self.reconcile_interval:
+                    self.reconcile()
+                reclaimed = self.sweep()
+                if reclaimed:
+                    self.reclaimed_bytes += reclaimed
+                    print("Janitor reclaimed", reclaimed, "bytes in", self.directory,
+                          "(" + str(self.reclaimed_bytes) + " bytes in total)")
+            except Exception:
+                traceback.print_exc()
+            self._stop.wait(self.interval)
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def start_janitor():
+    """
+    Start the process-wide Janitor of assets/uploads, unless it is already running. It is told about every file
+    written into or removed from assets/uploads through uploads_storage.
+
+    Returns:
+        Janitor: The running janitor.
+    """
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = Janitor(on_delete=get_library_index().forget)
+            add_file_listener(_janitor.track)
+            _janitor.start()
+        return _janitor
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+import traceback
+import uuid as uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# How many finished jobs a queue remembers before forgetting the oldest ones
+MAX_FINISHED_JOBS = 1000
+
+# Progress of a job whose total size is unknown is reported every this many bytes
+UNKNOWN_TOTAL_STEP = 1024 * 1024
+
+
+class Job:
+    """
+    A unit of work run by a JobQueue, with a state and a progress that listeners can follow.
+    """
+
+    def __init__(self, kind, description, func):
+        """
+        Args:
+            kind (str): The kind of job, e.g. "audio" or "playlist".
+            description (str): A human readable description, e.g. the requested URL.
+            func (callable): The work to do. It receives the job and its return value becomes the job result.
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.func = func
+        self.state = QUEUED
+        self.progress = 0.0  # Between 0 and 1, or None while the total size is unknown
+        self.bytes_done = 0
+        self.result = None
+        self.error = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener):
+        """
+        Register a function called with the job every time its state or progress changes.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def set_progress(self, written, total=None):
+        """
+        Report how many bytes of the job are done. Listeners are only notified when the visible progress changes.
+
+        Args:
+            written (int): The bytes done so far.
+            total (int, optional): The total bytes, when known.
+        """
+        previous_bytes = self.bytes_done
+        previous_progress = self.progress
+        self.bytes_done = written
+        if total:
+            self.progress = min(written / total, 1.0)
+            changed = previous_progress is None or int(self.progress * 100) != int(previous_progress * 100)
+        else:
+            self.progress = None
+            changed = written // UNKNOWN_TOTAL_STEP != previous_bytes // UNKNOWN_TOTAL_STEP
+        if changed:
+            self._notify()
+
+    def is_finished(self):
+        return self.state in (DONE, FAILED)
+
+    def _set_state(self, state):
+        self.state = state
+        self._notify()
+
+    def _notify(self):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                print("Job listener failed:", e)
+
+
+class JobQueue:
+    """
+    A bounded pool of worker threads running Jobs in submission order.
+    """
+
+    def __init__(self, name, max_workers):
+        """
+        Args:
+            name (str): The name of the queue, used for the worker thread names.
+            max_workers (int): The maximum number of jobs running at the same time.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs-" + name)
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, description, func, listener=None):
+        """
+        Enqueue a new job and return at once.
+
+        Args:
+            kind (str): The kind of job.
+            description (str): A human readable description of the job.
+            func (callable): The work to do, called with the job from a worker thread.
+            listener (callable, optional): Subscribed to the job before it can start.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(kind, description, func)
+        if listener is not None:
+            job.subscribe(listener)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._forget_finished_jobs()
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def _run(self, job):
+        job._set_state(RUNNING)
+        try:
+            job.result = job.func(job)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job._set_state(FAILED)
+        else:
+            job.progress = 1.0
+            job._set_state(DONE)
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(name, max_workers=None):
+    """
+    Return the process-wide JobQueue with the given name, creating it on first use.
+
+    Args:
+        name (str): The name of the queue, e.g. "downloads".
+        max_workers (int, optional): The size of the worker pool when the queue is created. Defaults to the
+            JOBS_<NAME>_WORKERS environment variable, or 4.
+
+    Returns:
+        JobQueue: The shared queue.
+    """
+    with _queues_lock:
+        queue = _queues.get(name)
+        if queue is None:
+            if max_workers is None:
+                max_workers = int(os.environ.get("JOBS_" + name.upper() + "_WORKERS", "4"))
+            queue = JobQueue(name, max_workers)
+            _queues[name] = queue
+        return queue
@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+from metrics import REGISTRY, CallbackGauge
+from uploads_storage import get_upload_path
+
+DEFAULT_PATH = os.environ.get("LIBRARY_INDEX_PATH", "library.sqlite3")
+
+DOWNLOAD = "download"
+UPLOAD = "upload"
+
+# Seconds a writer waits for another process or thread holding the write lock
+BUSY_TIMEOUT = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL UNIQUE,
+    origin TEXT NOT NULL,
+    source_url TEXT,
+    cache_key TEXT,
+    original_name TEXT,
+    content_hash TEXT,
+    size INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_cache_key ON tracks (cache_key);
+CREATE INDEX IF NOT EXISTS tracks_source_url ON tracks (source_url);
+CREATE INDEX IF NOT EXISTS tracks_content_hash ON tracks (content_hash);
+CREATE INDEX IF NOT EXISTS tracks_created_at ON tracks (created_at, id);
+"""
+
+# Full-text index over the descriptive columns, kept in sync with tracks by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, original_name, source_url, content='tracks', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts (rowid, title, artist, original_name, source_url)
+    VALUES (new.id, new.title, new.artist, new.original_name, new.source_url);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, title, artist, original_name, source_url)
+    VALUES ('delete', old.id, old.title, old.artist, old.original_name, old.source_url);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_fts_update AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, title, artist, original_name, source_url)
+    VALUES ('delete', old.id, old.title, old.artist, old.original_name, old.source_url);
+    INSERT INTO tracks_fts (rowid, title, artist, original_name, source_url)
+    VALUES (new.id, new.title, new.artist, new.original_name, new.source_url);
+END;
+"""
+
+_COLUMNS = ("file_name", "origin", "source_url", "cache_key", "original_name", "content_hash", "size", "title",
+            "artist")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_artist_title(name):
+    """
+    Read the artist and the title from a file name like "Artist - Title.mp3".
+
+    Args:
+        name (str or None): The file name.
+
+    Returns:
+        tuple: The artist (None if the name has no " - ") and the title (None without a name).
+    """
+    if not name:
+        return None, None
+    stem = os.path.splitext(os.path.basename(name))[0].strip()
+    artist, separator, title = stem.partition(" - ")
+    if not separator:
+        return None, stem or None
+    return artist.strip() or None, title.strip() or None
+
+
+def get_response_metadata(response):
+    """
+    Read the title and the artist of a downloaded track from the response of the backend, when it sends them:
+    from X-Track-Title and X-Track-Artist headers, or else from the file name of its Content-Disposition.
+
+    Args:
+        response (Response): The response of the backend.
+
+    Returns:
+        tuple: The title and the artist, each None when unknown.
+    """
+    title = response.headers.get("X-Track-Title")
+    artist = response.headers.get("X-Track-Artist")
+    if title is None and artist is None:
+        disposition = response.headers.get("Content-Disposition", "")
+        match = re.search(r"filename\*=UTF-8''([^;]+)", disposition, re.IGNORECASE) \
+            or re.search(r"filename=\"?([^\";]+)\"?", disposition, re.IGNORECASE)
+        if match is not None:
+            artist, title = split_artist_title(unquote(match.group(1)))
+    return title, artist
+
+
+class LibraryIndex:
+    """
+    Persistent SQLite index of the files downloaded and uploaded into assets/uploads.
+
+    The database is in WAL mode, so readers never block the writer and several frontend processes can share it.
+    Every thread uses its own connection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Args:
+            path (str): The path of the database file, created on first use.
+        """
+        self.path = path
+        self._local = threading.local()
+        connection = self.connect()
+        # executescript commits on its own, so each script carries its transaction
+        connection.executescript("BEGIN IMMEDIATE;" + _SCHEMA + "COMMIT;")
+        try:
+            connection.executescript("BEGIN IMMEDIATE;" + _FTS_SCHEMA + "COMMIT;")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: text search falls back to LIKE scans
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self.has_fts = False
+
+    def connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at every checkpoint; a crash can only lose the last few index updates, never corrupt it
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a write transaction, taking the write lock up front so it never fails half way on a busy database.
+
+        Yields:
+            sqlite3.Connection: The connection of the current thread.
+        """
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def record(self, file_name, origin, size, content_hash=None, source_url=None, cache_key=None,
+               original_name=None, title=None, artist=None):
+        """
+        Add a file to the index, or update its entry.
+
+        Args:
+            file_name (str): The file name inside assets/uploads.
+            origin (str): DOWNLOAD or UPLOAD.
+            size (int): The size of the file in bytes.
+            content_hash (str, optional): The hex SHA-256 of the file.
+            source_url (str, optional): The URL the file was downloaded from.
+            cache_key (str, optional): The download cache key of source_url.
+            original_name (str, optional): The name of the file on the computer of the uploader.
+            title (str, optional): The title of the track.
+            artist (str, optional): The artist of the track.
+        """
+        now = time.time()
+        values = (file_name, origin, source_url, cache_key, original_name, content_hash, size, title, artist)
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO tracks (" + ", ".join(_COLUMNS) + ", created_at, updated_at) "
+                "VALUES (" + ", ".join("?" * len(_COLUMNS)) + ", ?, ?) "
+                "ON CONFLICT (file_name) DO UPDATE SET " +
+                ", ".join(column + " = excluded." + column for column in _COLUMNS[1:]) +
+                ", updated_at = excluded.updated_at",
+                values + (now, now)
+            )
+
+    def forget(self, file_name):
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM tracks WHERE file_name = ?", (file_name,))
+
+    def get(self, file_name):
+        row = self.connect().execute("SELECT * FROM tracks WHERE file_name = ?", (file_name,)).fetchone()
+        return None if row is None else dict(row)
+
+    def find_by_cache_key(self, cache_key):
+        """
+        Find the most recent file downloaded for a cache key that is still in assets/uploads.
+
+        Entries whose file is gone are dropped on the way.
+
+        Args:
+            cache_key (str): The download cache key.
+
+        Returns:
+            dict or None: The entry, None if there is none.
+        """
+        rows = self.connect().execute(
+            "SELECT * FROM tracks WHERE cache_key = ? ORDER BY created_at DESC", (cache_key,)
+        ).fetchall()
+        for row in rows:
+            if os.path.exists(get_upload_path(row["file_name"])):
+                return dict(row)
+            self.forget(row["file_name"])
+        return None
+
+    def find_by_url(self, source_url):
+        return [dict(row) for row in self.connect().execute(
+            "SELECT * FROM tracks WHERE source_url = ? ORDER BY created_at DESC", (source_url,)
+        )]
+
+    def find_by_hash(self, content_hash):
+        return [dict(row) for row in self.connect().execute(
+            "SELECT * FROM tracks WHERE content_hash = ? ORDER BY created_at DESC", (content_hash,)
+        )]
+
+    def _match_condition(self, text):
+        """
+        Build the WHERE condition selecting the entries that match a text search.
+
+        Args:
+            text (str): The words to look for; every word must match the start of a word of the entry.
+
+        Returns:
+            tuple or None: The condition and its parameters, None if text has no word.
+        """
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        if self.has_fts:
+            query = " ".join("\"" + word + "\"*" for word in words)
+            return "id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?)", [query]
+        condition = " AND ".join(
+            "(title LIKE ? OR artist LIKE ? OR original_name LIKE ? OR source_url LIKE ?)" for _ in words
+        )
+        return condition, [value for word in words for value in ["%" + word + "%"] * 4]
+
+    def search(self, text, limit=50):
+        """
+        Search the entries by title, artist, uploaded file name or source URL.
+
+        Args:
+            text (str): The words to look for; every word must match the start of a word of the entry.
+            limit (int, optional): The maximum number of entries returned.
+
+        Returns:
+            list: The matching entries, best matches first.
+        """
+        match = self._match_condition(text)
+        if match is None:
+            return []
+        condition, parameters = match
+        if self.has_fts:
+            rows = self.connect().execute(
+                "SELECT tracks.* FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid "
+                "WHERE tracks_fts MATCH ? ORDER BY rank LIMIT ?",
+                parameters + [limit]
+            )
+        else:
+            rows = self.connect().execute(
+                "SELECT * FROM tracks WHERE " + condition + " ORDER BY created_at DESC LIMIT ?",
+                parameters + [limit]
+            )
+        return [dict(row) for row in rows]
+
+    def page(self, limit, cursor=None, newer=False, text=None):
+        """
+        Read a page of entries, newest first, with keyset paging: the cost of a page does not depend on how deep
+        it is in the library, unlike with OFFSET.
+
+        Args:
+            limit (int): The maximum number of entries returned.
+            cursor (tuple, optional): The (created_at, id) of an entry to page from, None for the newest entries.
+            newer (bool, optional): Read the entries just newer than cursor instead of just older.
+            text (str, optional): Only read the entries matching this text search.
+
+        Returns:
+            list: The entries, newest first.
+        """
+        conditions = []
+        parameters = []
+        if text:
+            match = self._match_condition(text)
+            if match is None:
+                return []
+            conditions.append(match[0])
+            parameters += match[1]
+        if cursor is not None:
+            conditions.append("(created_at, id) " + (">" if newer else "<") + " (?, ?)")
+            parameters += list(cursor)
+        order = "ASC" if newer else "DESC"
+        rows = [dict(row) for row in self.connect().execute(
+            "SELECT * FROM tracks" + (" WHERE " + " AND ".join(conditions) if conditions else "") +
+            " ORDER BY created_at " + order + ", id " + order + " LIMIT ?",
+            parameters + [limit]
+        )]
+        if newer:
+            rows.reverse()
+        return rows
+
+    def count(self, text=None):
+        if text:
+            match = self._match_condition(text)
+            if match is None:
+                return 0
+            return self.connect().execute("SELECT COUNT(*) FROM tracks WHERE " + match[0], match[1]).fetchone()[0]
+        return self.connect().execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+
+def index_uploaded_file(file_name, original_name=None):
+    """
+    Record a file uploaded into assets/uploads in the library index, hashing its content.
+
+    Args:
+        file_name (str): The file name inside assets/uploads.
+        original_name (str, optional): The name of the file on the computer of the uploader, file_name by default.
+    """
+    path = get_upload_path(file_name)
+    artist, title = split_artist_title(original_name or file_name)
+    get_library_index().record(
+        file_name,
+        UPLOAD,
+        os.path.getsize(path),
+        content_hash=hash_file(path),
+        original_name=original_name or file_name,
+        title=title,
+        artist=artist
+    )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_library_index():
+    """
+    Return the process-wide LibraryIndex, creating it on first use.
+
+    Returns:
+        LibraryIndex: The shared index.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LibraryIndex()
+        return _index
+
+
+REGISTRY.register(CallbackGauge(
+    "ytm_library_entries",
+    "Files of assets/uploads recorded in the library index.",
+    lambda: {(): get_library_index().count()}
+))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from flet import IconButton, ListTile, ListView, Text, TextField, icons
+
+from flet_constructors import request_update
+from upload_progress import format_bytes
+
+# Height of a row; a fixed extent lets the list lay out only the visible rows and jump anywhere without measuring
+ROW_HEIGHT = 72
+
+# Entries read from the index per fetch
+PAGE_SIZE = 100
+
+# Rows kept in the list at most; beyond it, the rows at the far end of the scroll are dropped
+MAX_LOADED_ROWS = 5 * PAGE_SIZE
+
+# Viewport heights before an end of the loaded rows at which the next page is fetched
+PREFETCH_VIEWPORTS = 2
+
+
+def get_entry_title(entry):
+    return entry["title"] or entry["original_name"] or entry["source_url"] or entry["file_name"]
+
+
+def get_entry_details(entry):
+    details = [entry["artist"], entry["origin"], format_bytes(entry["size"]),
+               time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created_at"]))]
+    return " · ".join(detail for detail in details if detail)
+
+
+class LibraryList:
+    """
+    Scrollable list of the library index that only holds a sliding window of its entries.
+
+    Pages are fetched from the index with keyset paging as the user scrolls towards either end of the window, and
+    the rows past MAX_LOADED_ROWS are dropped from the other end, so the client and the session keep a bounded
+    number of controls however large the library is. Every entry keeps its row control while it is in the window,
+    so an updated entry only sends its own row.
+    """
+
+    def __init__(self, page, index, open_file):
+        """
+        Args:
+            page (Page): The page of the session.
+            index (LibraryIndex): The index to list.
+            open_file (callable): Called with the file name of an entry the user opens.
+        """
+        self.page = page
+        self.index = index
+        self.open_file = open_file
+        self.text = None
+        self.entries = []  # the window, newest first
+        self.rows = {}  # entry id -> ListTile
+        self.at_start = True  # no entry newer than the window
+        self.at_end = True  # no entry older than the window
+        self._lock = threading.Lock()
+
+        self.search_field = TextField(label="Search title, artist or URL", on_submit=self.on_search)
+        self.summary_text = Text("")
+        self.list_view = ListView(
+            expand=True,
+            spacing=0,
+            item_extent=ROW_HEIGHT,
+            on_scroll_interval=100,
+            on_scroll=self.on_scroll
+        )
+
+    def get_controls(self):
+        """
+        Returns:
+            list: The controls of the library view.
+        """
+        return [self.search_field, self.summary_text, self.list_view]
+
+    def create_row(self, entry):
+        file_name = entry["file_name"]
+        row = ListTile(
+            key=str(entry["id"]),
+            title=Text(get_entry_title(entry), no_wrap=True),
+            subtitle=Text(get_entry_details(entry), no_wrap=True),
+            trailing=IconButton(icons.OPEN_IN_NEW, tooltip="Open", on_click=lambda _: self.open_file(file_name)),
+        )
+        self.rows[entry["id"]] = row
+        return row
+
+    def set_entries(self, entries):
+        self.entries = entries
+        self.rows = {}
+        self.list_view.controls = [self.create_row(entry) for entry in entries]
+
+    def reload(self, text=None):
+        """
+        Show the newest entries, only those matching a text search if given.
+
+        Args:
+            text (str, optional): The text search.
+        """
+        with self._lock:
+            self.text = text or None
+            entries = self.index.page(PAGE_SIZE, text=self.text)
+            self.set_entries(entries)
+            self.at_start = True
+            self.at_end = len(entries) < PAGE_SIZE
+            self.update_summary()
+        if self.list_view.page is not None:
+            request_update(self.page, self.summary_text, self.list_view)
+
+    def update_summary(self):
+        count = self.index.count(self.text)
+        self.summary_text.value = str(count) + (" matching tracks" if self.text else " tracks")
+
+    def on_search(self, e):
+        self.reload(self.search_field.value)
+
+    def on_scroll(self, e):
+        # Events keep coming while a page is loading; they are dropped rather than queued
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            margin = PREFETCH_VIEWPORTS * e.viewport_dimension
+            if not self.at_end and e.pixels >= e.max_scroll_extent - margin:
+                self.load_older(e.pixels)
+            elif not self.at_start and e.pixels <= e.min_scroll_extent + margin:
+                self.load_newer(e.pixels)
+        finally:
+            self._lock.release()
+
+    def load_older(self, pixels):
+        entries = self.index.page(PAGE_SIZE, self.get_cursor(self.entries[-1]), text=self.text) \
+            if self.entries else []
+        self.at_end = len(entries) < PAGE_SIZE
+        if not entries:
+            return
+        self.entries += entries
+        self.list_view.controls += [self.create_row(entry) for entry in entries]
+
+        dropped = self.trim(from_start=True)
+        self.list_view.update()
+        if dropped:
+            # The rows above the viewport are gone: move up by their height so the visible rows stay in place
+            self.list_view.scroll_to(offset=max(0, pixels - dropped * ROW_HEIGHT), duration=0)
+
+    def load_newer(self, pixels):
+        entries = self.index.page(PAGE_SIZE, self.get_cursor(self.entries[0]), newer=True, text=self.text) \
+            if self.entries else []
+        self.at_start = len(entries) < PAGE_SIZE
+        if not entries:
+            return
+        self.entries = entries + self.entries
+        self.list_view.controls = [self.create_row(entry) for entry in entries] + self.list_view.controls
+
+        self.trim(from_start=False)
+        self.list_view.update()
+        self.list_view.scroll_to(offset=pixels + len(entries) * ROW_HEIGHT, duration=0)
+
+    def trim(self, from_start):
+        """
+        Drop the rows beyond MAX_LOADED_ROWS from one end of the window.
+
+        Args:
+            from_start (bool): Drop the newest rows instead of the oldest.
+
+        Returns:
+            int: The number of dropped rows.
+        """
+        excess = len(self.entries) - MAX_LOADED_ROWS
+        if excess <= 0:
+            return 0
+        if from_start:
+            dropped, self.entries = self.entries[:excess], self.entries[excess:]
+            self.list_view.controls = self.list_view.controls[excess:]
+            self.at_start = False
+        else:
+            dropped, self.entries = self.entries[-excess:], self.entries[:-excess]
+            self.list_view.controls = self.list_view.controls[:-excess]
+            self.at_end = False
+        for entry in dropped:
+            self.rows.pop(entry["id"], None)
+        return excess
+
+    @staticmethod
+    def get_cursor(entry):
+        return entry["created_at"], entry["id"]
+
+    def show_entry(self, file_name):
+        """
+        Show a new or updated entry of the index: its row is updated in place when it is in the window, and a new
+        entry is added on top when the window starts at the newest entry.
+
+        Args:
+            file_name (str): The file name of the entry.
+        """
+        entry = self.index.get(file_name)
+        if entry is None:
+            return
+        with self._lock:
+            row = self.rows.get(entry["id"])
+            if row is not None:
+                position = next(i for i, loaded in enumerate(self.entries) if loaded["id"] == entry["id"])
+                self.entries[position] = entry
+                row.title.value = get_entry_title(entry)
+                row.subtitle.value = get_entry_details(entry)
+                controls = [row]
+            elif self.at_start and self.text is None:
+                self.entries.insert(0, entry)
+                self.list_view.controls.insert(0, self.create_row(entry))
+                self.trim(from_start=False)
+                controls = [self.list_view]
+            else:
+                controls = []
+            self.update_summary()
+        if self.list_view.page is not None:  # The user may have navigated away from the library
+            request_update(self.page, self.summary_text, *controls)
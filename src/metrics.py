@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [
+        name + "=\"" + str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") + "\""
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of the metrics. Label values are passed positionally, in the order of label_names.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = ["# HELP " + self.name + " " + self.documentation, "# TYPE " + self.name + " " + self.kind]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        return []
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        super().__init__(name, documentation, label_names)
+        self.values = {}
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self.values.items())
+        return [
+            self.name + _format_labels(self.label_names, labels) + " " + _format_value(value)
+            for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, *label_values):
+        self.inc(-amount, *label_values)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self.values[label_values] = value
+
+
+class CallbackGauge(Metric):
+    """
+    Gauge whose samples are read from a function at scrape time, for values another module already tracks.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, func, label_names=()):
+        """
+        Args:
+            func (callable): Returns a dict mapping tuples of label values to values.
+        """
+        super().__init__(name, documentation, label_names)
+        self.func = func
+
+    def _samples(self):
+        return [
+            self.name + _format_labels(self.label_names, labels) + " " + _format_value(value)
+            for labels, value in self.func().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self.values.get(label_values)
+            if data is None:
+                data = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(labels, list(data)) for labels, data in self.values.items()]
+        lines = []
+        for labels, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), data[:len(self.buckets)] + [0]):
+                cumulative += count
+                if bound == float("inf"):
+                    cumulative = data[-1]  # Values above the last bucket are only counted in the total
+                lines.append(
+                    self.name + "_bucket"
+                    + _format_labels(self.label_names, labels, "le=\"" + _format_value(bound) + "\"")
+                    + " " + str(cumulative)
+                )
+            lines.append(self.name + "_sum" + _format_labels(self.label_names, labels) + " " + _format_value(data[-2]))
+            lines.append(self.name + "_count" + _format_labels(self.label_names, labels) + " " + str(data[-1]))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self.metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+BACKEND_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ytm_backend_request_seconds",
+    "Time until the response headers of a /api/global/* backend request.",
+    ("endpoint",)
+))
+BACKEND_RESPONSES = REGISTRY.register(Counter(
+    "ytm_backend_responses_total",
+    "Backend responses per endpoint and status code, \"error\" when no response was received.",
+    ("endpoint", "status")
+))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "ytm_active_sessions",
+    "FrontEnd sessions currently open."
+))
+TRANSFERRED_BYTES = REGISTRY.register(Counter(
+    "ytm_transferred_bytes_total",
+    "Bytes moved through assets/uploads: downloaded from the backend, uploaded by browsers, forwarded to the "
+    "backend.",
+    ("direction",)
+))
+
+
+def serve_metrics(request, path):
+    """
+    Side server handler answering a scrape with the content of REGISTRY.
+
+    Args:
+        request (BaseHTTPRequestHandler): The request.
+        path (str): The rest of the path (not used).
+    """
+    body = REGISTRY.render().encode("utf-8")
+    request.send_response(200)
+    request.send_header("Content-Type", CONTENT_TYPE)
+    request.send_header("Content-Length", str(len(body)))
+    request.end_headers()
+    if request.command != "HEAD":
+        request.wfile.write(body)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import uuid as uuid
+
+
+def _quote(value):
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartFileStream:
+    """
+    Read-only file-like multipart/form-data body holding a single file part.
+
+    The body is produced on demand from the underlying file object, so sending it costs one read buffer of memory
+    whatever the size of the file. Its length is known up front, which lets requests send a Content-Length header
+    instead of buffering the body.
+    """
+
+    def __init__(self, field_name, file_name, fileobj, size, content_type="application/octet-stream"):
+        """
+        Args:
+            field_name (str): The name of the form field.
+            file_name (str): The file name sent in the Content-Disposition header.
+            fileobj (file): The opened binary file to send, positioned at its start.
+            size (int): The number of bytes of fileobj to send.
+            content_type (str, optional): The content type of the file part.
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + boundary
+        self.fileobj = fileobj
+        self.head = (
+            "--" + boundary + "\r\n"
+            "Content-Disposition: form-data; name=\"" + _quote(field_name) + "\"; "
+            "filename=\"" + _quote(file_name) + "\"\r\n"
+            "Content-Type: " + content_type + "\r\n"
+            "\r\n"
+        ).encode("utf-8")
+        self.tail = ("\r\n--" + boundary + "--\r\n").encode("utf-8")
+        self.size = size
+        self.position = 0
+        self.length = len(self.head) + size + len(self.tail)
+
+    def __len__(self):
+        return self.length - self.position
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes of the body.
+
+        Args:
+            size (int, optional): The maximum number of bytes to return. Everything left when negative.
+
+        Returns:
+            bytes: The next bytes of the body, empty once it is exhausted.
+        """
+        if size is None or size < 0:
+            size = self.length - self.position
+
+        parts = []
+        while size > 0 and self.position < self.length:
+            data = self._read_part(size)
+            if not data:
+                raise IOError("the file ended before its announced size")
+            parts.append(data)
+            self.position += len(data)
+            size -= len(data)
+        return b"".join(parts)
+
+    def _read_part(self, size):
+        head_end = len(self.head)
+        file_end = head_end + self.size
+        if self.position < head_end:
+            return self.head[self.position:self.position + size]
+        if self.position < file_end:
+            return self.fileobj.read(min(size, file_end - self.position))
+        start = self.position - file_end
+        return self.tail[start:start + size]
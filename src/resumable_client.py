@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Client of the resumable upload protocol of the side server, see resumable_uploads.
+
+    python src/resumable_client.py http://127.0.0.1:5011 playlist.zip --token <token shown by the upload view>
+    python src/resumable_client.py http://127.0.0.1:5011 playlist.zip --upload-id <id of the interrupted upload>
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import requests
+
+CHECKSUM_HEADER = "X-Chunk-Sha256"
+TOKEN_HEADER = "X-Upload-Token"
+TIMEOUT = (3.05, 120)
+
+
+def read_chunk(f, index, chunk_size):
+    f.seek(index * chunk_size)
+    return f.read(chunk_size)
+
+
+def upload_file(base_url, path, upload_id=None, retries=5, progress=None, session=None, token=None):
+    """
+    Upload a file with the resumable protocol, resuming an interrupted upload when its id is given.
+
+    Only the chunks the server is missing are sent. When the connection drops, the upload is resumed after asking
+    the server which chunks it already has, up to retries times in a row.
+
+    Args:
+        base_url (str): The URL of the side server, e.g. "http://127.0.0.1:5011".
+        path (str): The path of the file to upload.
+        upload_id (str, optional): The id of an upload of the same file to resume.
+        retries (int, optional): How many failed attempts in a row are retried.
+        progress (callable, optional): Called with (chunks received, chunk count) after every chunk.
+        session (requests.Session, optional): The session to send the requests with.
+        token (str, optional): The upload token issued by the frontend, required to start a new upload.
+
+    Returns:
+        dict: The description of the completed upload, whose "upload_id" can be polled for the forwarding state.
+    """
+    session = session or requests.Session()
+    uploads_url = base_url.rstrip("/") + "/uploads"
+    if upload_id is None:
+        response = session.post(
+            uploads_url,
+            json={"file_name": os.path.basename(path), "size": os.path.getsize(path)},
+            headers={TOKEN_HEADER: token or ""},
+            timeout=TIMEOUT
+        )
+        response.raise_for_status()
+        upload_id = response.json()["upload_id"]
+        print("Upload", upload_id, "started")
+    upload_url = uploads_url + "/" + upload_id
+
+    failures = 0
+    with open(path, "rb") as f:
+        while True:
+            try:
+                response = session.get(upload_url, timeout=TIMEOUT)
+                response.raise_for_status()
+                upload = response.json()
+                for index in upload["missing"]:
+                    chunk = read_chunk(f, index, upload["chunk_size"])
+                    response = session.put(
+                        upload_url + "/" + str(index),
+                        data=chunk,
+                        headers={CHECKSUM_HEADER: hashlib.sha256(chunk).hexdigest()},
+                        timeout=TIMEOUT
+                    )
+                    response.raise_for_status()
+                    failures = 0
+                    if progress is not None:
+                        upload["received"].append(index)
+                        progress(len(upload["received"]), upload["chunk_count"])
+
+                response = session.post(upload_url + "/complete", timeout=TIMEOUT)
+                response.raise_for_status()
+                return response.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                failures += 1
+                if failures > retries:
+                    raise
+                print("Upload", upload_id, "interrupted (" + str(e) + "), resuming")
+                time.sleep(min(2 ** failures, 30))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload a file to the frontend with the resumable upload protocol.")
+    parser.add_argument("base_url", help="URL of the side server, e.g. http://127.0.0.1:5011")
+    parser.add_argument("path", help="the .mp3 or .zip file to upload")
+    parser.add_argument("--token", help="upload token shown by the upload views of the frontend, to start an upload")
+    parser.add_argument("--upload-id", help="id of an interrupted upload of the same file to resume")
+    args = parser.parse_args()
+
+    upload = upload_file(
+        args.base_url,
+        args.path,
+        args.upload_id,
+        token=args.token,
+        progress=lambda received, count: print("\r" + str(received) + "/" + str(count) + " chunks", end="")
+    )
+    print()
+    print("Upload", upload["upload_id"], "complete, forwarding to the backend:", upload["state"])
+
+
+if __name__ == "__main__":
+    main()
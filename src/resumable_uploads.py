@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Resumable chunked uploads, served by the side server:
+
+    POST /uploads                    {"file_name": ..., "size": ...}  -> the new upload with its chunk size
+                                     with the X-Upload-Token header issued by a Flet session
+    PUT  /uploads/<id>/<index>       one chunk, with its SHA-256 in the X-Chunk-Sha256 header
+    GET  /uploads/<id>               the upload with its received and missing chunks, and its forwarding state
+    POST /uploads/<id>/complete      assemble the file into assets/uploads and forward it to the backend
+
+A client that lost its connection asks for the upload and only sends the missing chunks. The id of an upload is
+unguessable, so it is what authorizes the requests on it once started.
+"""
+import errno
+import hashlib
+import hmac
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid as uuid
+
+from janitor import Janitor
+from jobs import get_job_queue
+from side_server import register_route
+from uploads_storage import UPLOADS_DIR, TEMP_PREFIX, get_upload_path, notify_saved
+
+UPLOADS_PREFIX = "/uploads"
+
+# Received chunks are kept here, outside of the assets served by Flet, until their upload is complete
+SESSIONS_DIR = os.environ.get("RESUMABLE_UPLOADS_DIR", "resumable_uploads")
+DEFAULT_CHUNK_SIZE = int(os.environ.get("RESUMABLE_CHUNK_SIZE", str(8 * 1024 ** 2)))
+MAX_FILE_BYTES = int(os.environ.get("RESUMABLE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Uploads without a new chunk for this many seconds are abandoned and deleted
+SESSION_MAX_AGE = int(os.environ.get("RESUMABLE_MAX_AGE", str(24 * 3600)))
+
+# Completed uploads whose forwarding state clients can still ask for
+MAX_FINISHED_SESSIONS = 100
+
+# Unfinished uploads at most, each holding a data file of its announced size
+MAX_ACTIVE_SESSIONS = int(os.environ.get("RESUMABLE_MAX_ACTIVE", "20"))
+
+# Starting an upload requires a token issued by a Flet session, see issue_upload_token
+TOKEN_HEADER = "X-Upload-Token"
+TOKEN_MAX_AGE = int(os.environ.get("RESUMABLE_TOKEN_MAX_AGE", "3600"))
+# Frontend processes behind the same side server address must share it; a random one only suits a single process
+_TOKEN_SECRET = os.environ.get("RESUMABLE_UPLOADS_SECRET", "").encode("utf-8") or os.urandom(32)
+
+ALLOWED_EXTENSIONS = ("mp3", "zip")
+CHECKSUM_HEADER = "X-Chunk-Sha256"
+READ_SIZE = 64 * 1024
+
+RECEIVING = "receiving"
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _sign(expires):
+    return hmac.new(_TOKEN_SECRET, str(expires).encode("ascii"), hashlib.sha256).hexdigest()
+
+
+def issue_upload_token(max_age=TOKEN_MAX_AGE):
+    """
+    Issue a token allowing to start resumable uploads, like the signed upload URLs of Flet.
+
+    Args:
+        max_age (int, optional): The seconds the token is valid for.
+
+    Returns:
+        str: The token, to send in the X-Upload-Token header of POST /uploads.
+    """
+    expires = int(time.time()) + max_age
+    return str(expires) + "." + _sign(expires)
+
+
+def is_upload_token_valid(token):
+    expires, _, signature = (token or "").partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(int(expires)))
+
+
+class UploadError(Exception):
+    """
+    Raised when a request of the protocol cannot be honoured, with the status code to answer.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadSession:
+    """
+    An upload in progress: its announced file, the chunks received so far and, once complete, its forwarding job.
+
+    The received chunks are written in place into a data file of the final size, and the list of received chunks
+    is saved next to it after every chunk, so an upload survives a restart of the frontend.
+    """
+
+    def __init__(self, upload_id, file_name, size, chunk_size, received=()):
+        self.upload_id = upload_id
+        self.file_name = file_name
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunk_count = max(1, -(-size // chunk_size))
+        self.received = set(received)
+        self.job = None
+        self.lock = threading.Lock()
+
+    @property
+    def data_path(self):
+        return os.path.join(SESSIONS_DIR, self.upload_id + ".data")
+
+    @property
+    def state_path(self):
+        return os.path.join(SESSIONS_DIR, self.upload_id + ".json")
+
+    def get_chunk_length(self, index):
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def save(self):
+        state = {
+            "file_name": self.file_name,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "received": sorted(self.received),
+        }
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=SESSIONS_DIR)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def describe(self):
+        """
+        Returns:
+            dict: The JSON description of the upload sent to clients.
+        """
+        with self.lock:
+            received = set(self.received)
+        description = {
+            "upload_id": self.upload_id,
+            "file_name": self.file_name,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "chunk_count": self.chunk_count,
+            "received": sorted(received),
+            "missing": [index for index in range(self.chunk_count) if index not in received],
+            "state": RECEIVING if self.job is None else self.job.state,
+        }
+        if self.job is not None and self.job.error is not None:
+            description["error"] = self.job.error
+        return description
+
+
+class ResumableUploads:
+    """
+    The server side of the resumable upload protocol: keeps track of the uploads and of their received chunks.
+    """
+
+    def __init__(self, forward, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            forward (callable): Called from a job of the "uploads" queue with the name of a completed file inside
+                assets/uploads and the file name the client announced, to send it to the backend. It raises when
+                the backend does not accept the file.
+            chunk_size (int, optional): The size of every chunk but the last one, in bytes.
+        """
+        self.forward = forward
+        self.chunk_size = chunk_size
+        self.sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+
+    def create(self, file_name, size):
+        """
+        Start an upload.
+
+        Args:
+            file_name (str): The name of the file, which it keeps in assets/uploads.
+            size (int): The size of the file in bytes.
+
+        Returns:
+            UploadSession: The new upload.
+        """
+        file_name = os.path.basename(str(file_name or ""))
+        if not file_name or file_name.startswith("."):
+            raise UploadError(400, "invalid file name")
+        if file_name.rpartition(".")[2].lower() not in ALLOWED_EXTENSIONS:
+            raise UploadError(415, "only " + ", ".join(ALLOWED_EXTENSIONS) + " files can be uploaded")
+        if not isinstance(size, int) or size <= 0 or size > MAX_FILE_BYTES:
+            raise UploadError(413 if isinstance(size, int) and size > 0 else 400, "invalid size")
+
+        session = UploadSession(uuid.uuid4().hex, file_name, size, self.chunk_size)
+        with self._lock:
+            self._prune()
+            # The state files on disk also count the uploads paused before a restart
+            active = sum(1 for name in os.listdir(SESSIONS_DIR) if name.endswith(".json"))
+            if active >= MAX_ACTIVE_SESSIONS:
+                raise UploadError(429, "too many uploads in progress, complete or abandon one first")
+            with open(session.data_path, "wb") as f:
+                f.truncate(size)
+            session.save()
+            self.sessions[session.upload_id] = session
+        return session
+
+    def _prune(self):
+        finished = [upload_id for upload_id, session in self.sessions.items()
+                    if session.job is not None and session.job.is_finished()]
+        for upload_id in finished[:-MAX_FINISHED_SESSIONS]:
+            del self.sessions[upload_id]
+        # Uploads whose files the janitor deleted were abandoned
+        abandoned = [upload_id for upload_id, session in self.sessions.items()
+                     if session.job is None and not os.path.exists(session.state_path)]
+        for upload_id in abandoned:
+            del self.sessions[upload_id]
+
+    def get(self, upload_id):
+        """
+        Find an upload, loading it from disk when it was started before a restart.
+
+        Raises:
+            UploadError: If there is no such upload.
+        """
+        if not _UPLOAD_ID.match(upload_id):
+            raise UploadError(404, "unknown upload")
+        with self._lock:
+            session = self.sessions.get(upload_id)
+            if session is not None:
+                return session
+            try:
+                with open(os.path.join(SESSIONS_DIR, upload_id + ".json")) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                raise UploadError(404, "unknown upload")
+            session = UploadSession(upload_id, state["file_name"], state["size"], state["chunk_size"],
+                                    state["received"])
+            if not os.path.exists(session.data_path):
+                raise UploadError(404, "unknown upload")
+            self.sessions[upload_id] = session
+            return session
+
+    def write_chunk(self, session, index, length, checksum, stream):
+        """
+        Write one chunk in place, and mark it as received once its checksum matches.
+
+        Args:
+            session (UploadSession): The upload.
+            index (int): The index of the chunk.
+            length (int): The length of the body carrying the chunk.
+            checksum (str): The hex SHA-256 of the chunk announced by the client.
+            stream (file): The body to read the chunk from.
+
+        Returns:
+            bool: False if the chunk had already been received, in which case the body is only drained.
+        """
+        if session.job is not None:
+            raise UploadError(409, "the upload is already complete")
+        if not 0 <= index < session.chunk_count:
+            raise UploadError(416, "no chunk " + str(index))
+        if length != session.get_chunk_length(index):
+            raise UploadError(400, "chunk " + str(index) + " must be " + str(session.get_chunk_length(index)) +
+                              " bytes")
+        if not checksum:
+            raise UploadError(400, "missing " + CHECKSUM_HEADER + " header")
+
+        if index in session.received:
+            _drain(stream, length)
+            return False
+
+        digest = hashlib.sha256()
+        offset = index * session.chunk_size
+        fd = os.open(session.data_path, os.O_WRONLY)
+        try:
+            remaining = length
+            while remaining > 0:
+                data = stream.read(min(remaining, READ_SIZE))
+                if not data:
+                    raise UploadError(400, "the chunk ended before its announced length")
+                digest.update(data)
+                # Chunks land at disjoint offsets, so concurrent chunks of an upload do not need a lock here
+                os.pwrite(fd, data, offset)
+                offset += len(data)
+                remaining -= len(data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError(422, "checksum mismatch for chunk " + str(index))
+        with session.lock:
+            session.received.add(index)
+            session.save()
+        return True
+
+    def complete(self, session):
+        """
+        Move a fully received file into assets/uploads and enqueue its forwarding to the backend.
+
+        Returns:
+            Job: The forwarding job.
+        """
+        with session.lock:
+            if session.job is not None:
+                return session.job
+            if len(session.received) != session.chunk_count:
+                raise UploadError(409, str(session.chunk_count - len(session.received)) + " chunks are missing")
+
+            # Prefixed with the upload id, so it never replaces the file of another upload
+            file_name = session.upload_id + "-" + session.file_name
+            try:
+                _move_into_uploads(session.data_path, file_name)
+            except OSError as e:
+                print("Upload", session.upload_id, "could not be moved into", UPLOADS_DIR + ":", e)
+                raise UploadError(500, "the upload could not be stored")
+            os.remove(session.state_path)
+            session.job = get_job_queue("uploads").submit(
+                "resumable",
+                file_name,
+                lambda job: self.forward(job.description, session.file_name)
+            )
+            return session.job
+
+    def handle_post(self, request, path):
+        if path in ("", "/"):
+            if not is_upload_token_valid(request.headers.get(TOKEN_HEADER)):
+                raise UploadError(401, "missing, invalid or expired " + TOKEN_HEADER + " header")
+            data = _read_json(request)
+            session = self.create(data.get("file_name"), data.get("size"))
+            _send_json(request, 201, session.describe(), {"Location": UPLOADS_PREFIX + "/" + session.upload_id})
+            return
+
+        upload_id, _, action = path.strip("/").partition("/")
+        if action != "complete":
+            raise UploadError(404, "unknown action")
+        session = self.get(upload_id)
+        self.complete(session)
+        _send_json(request, 202, session.describe())
+
+    def handle_put(self, request, path):
+        upload_id, _, index = path.strip("/").partition("/")
+        session = self.get(upload_id)
+        if not index.isdigit():
+            raise UploadError(404, "unknown chunk")
+        length = int(request.headers.get("Content-Length", "0"))
+        written = self.write_chunk(session, int(index), length, request.headers.get(CHECKSUM_HEADER), request.rfile)
+        _send_json(request, 201 if written else 200, {"index": int(index), "received": True})
+
+    def handle_get(self, request, path):
+        _send_json(request, 200, self.get(path.strip("/")).describe())
+
+
+def _move_into_uploads(path, file_name):
+    """
+    Move a file into assets/uploads, copying it when SESSIONS_DIR is on another filesystem.
+
+    Args:
+        path (str): The path of the file to move.
+        file_name (str): Its name inside assets/uploads.
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    try:
+        os.replace(path, get_upload_path(file_name))
+        notify_saved(file_name)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # Copied under a temporary name first, so a reader never sees a half-copied file
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=UPLOADS_DIR)
+    os.close(fd)
+    try:
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, get_upload_path(file_name))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    os.remove(path)
+    notify_saved(file_name)
+
+
+def _drain(stream, length):
+    while length > 0:
+        data = stream.read(min(length, READ_SIZE))
+        if not data:
+            break
+        length -= len(data)
+
+
+def _read_json(request):
+    length = int(request.headers.get("Content-Length", "0"))
+    try:
+        data = json.loads(request.rfile.read(length) or b"{}")
+    except ValueError:
+        raise UploadError(400, "invalid JSON")
+    if not isinstance(data, dict):
+        raise UploadError(400, "invalid JSON")
+    return data
+
+
+def _send_json(request, status, data, headers=None):
+    body = json.dumps(data).encode("utf-8")
+    request.send_response(status)
+    request.send_header("Content-Type", "application/json")
+    request.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        request.send_header(name, value)
+    request.end_headers()
+    if request.command != "HEAD":
+        request.wfile.write(body)
+
+
+def _protocol_handler(handle):
+    def handler(request, path):
+        try:
+            handle(request, path)
+        except UploadError as e:
+            # The rest of a rejected body is not read, so the connection cannot be reused
+            request.close_connection = True
+            _send_json(request, e.status, {"error": str(e)})
+
+    return handler
+
+
+_uploads = None
+_uploads_lock = threading.Lock()
+
+
+def register_resumable_upload_routes(forward):
+    """
+    Serve the resumable upload protocol from the side server, and clean up the abandoned uploads in background.
+
+    Args:
+        forward (callable): Sends a completed file of assets/uploads to the backend, see ResumableUploads.
+
+    Returns:
+        ResumableUploads: The process-wide uploads.
+    """
+    global _uploads
+    with _uploads_lock:
+        if _uploads is None:
+            _uploads = ResumableUploads(forward)
+            register_route("POST", UPLOADS_PREFIX, _protocol_handler(_uploads.handle_post))
+            register_route("PUT", UPLOADS_PREFIX, _protocol_handler(_uploads.handle_put))
+            register_route("GET", UPLOADS_PREFIX, _protocol_handler(_uploads.handle_get))
+            # Age only: deleting a paused upload to make room would defeat resuming it. Chunk writes are not
+            # reported, but at most MAX_ACTIVE_SESSIONS uploads live there, so it is walked on every pass
+            Janitor(SESSIONS_DIR, max_age=SESSION_MAX_AGE, max_bytes=None, reconcile_interval=0).start()
+        return _uploads
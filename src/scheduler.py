@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads running the due calls, so one slow call (e.g. a page.update to a stalled client) does not delay the others
+DEFAULT_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", "4"))
+
+
+class ScheduledCall:
+    """
+    A function call scheduled on a Scheduler, which can be cancelled until it runs.
+    """
+
+    def __init__(self, when, func, owner):
+        self.when = when
+        self.func = func
+        self.owner = owner
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Run functions after a delay, without blocking the caller.
+
+    A single background thread waits for the calls to be due and hands them to a small pool of worker threads.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        """
+        Args:
+            max_workers (int, optional): The number of threads running the due calls.
+        """
+        self._heap = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler-call")
+        self._counter = itertools.count()  # Breaks ties between calls scheduled for the same time
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay, func, owner=None):
+        """
+        Schedule a function to be called after a delay.
+
+        Args:
+            delay (float): The delay in seconds.
+            func (callable): The function to call, without arguments.
+            owner (object, optional): The object the call belongs to, so all its calls can be cancelled at once.
+
+        Returns:
+            ScheduledCall: The scheduled call.
+        """
+        call = ScheduledCall(time.monotonic() + delay, func, owner)
+        with self._condition:
+            heapq.heappush(self._heap, (call.when, next(self._counter), call))
+            self._condition.notify()
+        return call
+
+    def cancel_owner(self, owner):
+        """
+        Cancel every pending call scheduled by an owner.
+
+        Args:
+            owner (object): The owner given to call_later.
+        """
+        with self._condition:
+            for _, _, call in self._heap:
+                if call.owner is owner:
+                    call.cancel()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                _, _, call = heapq.heappop(self._heap)
+            if not call.cancelled:
+                self._executor.submit(self._call, call)
+
+    @staticmethod
+    def _call(call):
+        # Cancelled calls are checked again, as they may have waited for a free worker
+        if call.cancelled:
+            return
+        try:
+            call.func()
+        except Exception:
+            traceback.print_exc()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide Scheduler, starting it on first use.
+
+    Returns:
+        Scheduler: The shared scheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+
+# The name the Flutter loader of the published build registers, so that only one worker controls the app
+SERVICE_WORKER = "flutter_service_worker.js"
+
+# Not part of the shell: only the CanvasKit renderer needs them, and the build uses the HTML renderer
+PRECACHE_EXCLUDED_PREFIXES = ("canvaskit/",)
+PRECACHE_MAX_BYTES = 20 * 1024 ** 2
+
+# Paths of the finished downloads, served by the side server or, before it, by Flet
+DOWNLOAD_PATHS = ("/files/", "/assets/uploads/")
+
+REGISTRATION_SNIPPET = (
+    "<script>"
+    "if (\"serviceWorker\" in navigator) {"
+    " window.addEventListener(\"load\", function () {"
+    " navigator.serviceWorker.register(\"" + SERVICE_WORKER + "\"); });"
+    " }"
+    "</script>"
+)
+
+_TEMPLATE = """// Generated by static_bundle.py, do not edit.
+const VERSION = %(version)s;
+const PRECACHE = %(precache)s;
+const DOWNLOAD_PATHS = %(download_paths)s;
+const INDEX = "index.html";
+
+const CACHE_PREFIX = "ytm-";
+const SHELL_CACHE = CACHE_PREFIX + "shell-" + VERSION;
+const STATIC_CACHE = CACHE_PREFIX + "static-" + VERSION;
+// Not versioned: downloads stay playable offline across builds
+const DOWNLOADS_CACHE = CACHE_PREFIX + "downloads";
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(SHELL_CACHE)
+      .then((cache) => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  // Drop the caches of the previous builds
+  const current = [SHELL_CACHE, STATIC_CACHE, DOWNLOADS_CACHE];
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(
+        names
+          .filter((name) => name.startsWith(CACHE_PREFIX) && !current.includes(name))
+          .map((name) => caches.delete(name))
+      ))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET") {
+    return;
+  }
+  const url = new URL(request.url);
+  if (DOWNLOAD_PATHS.some((path) => url.pathname.startsWith(path))) {
+    event.respondWith(serveDownload(event, url));
+  } else if (url.origin !== self.location.origin) {
+    return;
+  } else if (request.mode === "navigate") {
+    event.respondWith(serveShell(request));
+  } else {
+    event.respondWith(staleWhileRevalidate(event));
+  }
+});
+
+// Every route of the app renders the same shell, from the cache without waiting for the network
+async function serveShell(request) {
+  const cache = await caches.open(SHELL_CACHE);
+  const cached = await cache.match(INDEX);
+  if (cached) {
+    return cached;
+  }
+  return fetch(request);
+}
+
+async function staleWhileRevalidate(event) {
+  const request = event.request;
+  const cached = await caches.match(request);
+  const update = fetch(request)
+    .then(async (response) => {
+      if (response.status === 200) {
+        const cache = await caches.open(STATIC_CACHE);
+        await cache.put(request, response.clone());
+      }
+      return response;
+    })
+    .catch(() => undefined);
+  if (cached) {
+    event.waitUntil(update);
+    return cached;
+  }
+  return (await update) || Response.error();
+}
+
+async function serveDownload(event, url) {
+  url.search = "";
+  const cache = await caches.open(DOWNLOADS_CACHE);
+  const cached = await cache.match(url.href);
+  const range = event.request.headers.get("Range");
+  if (cached) {
+    return sliceRange(cached, range);
+  }
+
+  if (range) {
+    // The player is seeking: answer from the network right away and keep the whole file for later
+    event.waitUntil(fetchDownload(cache, url).catch(() => undefined));
+    return fetch(event.request);
+  }
+  const response = await fetchDownload(cache, url);
+  return response || fetch(event.request);
+}
+
+// Keep a whole audio file; archives are too big for the cache and are not played anyway
+async function fetchDownload(cache, url) {
+  const response = await fetch(url.href, {mode: "cors"});
+  const type = response.headers.get("Content-Type") || "";
+  if (response.status !== 200 || !type.startsWith("audio/")) {
+    return response;
+  }
+  await cache.put(url.href, response.clone());
+  return response;
+}
+
+// The Cache API only stores whole responses, so byte ranges are cut from the cached file
+async function sliceRange(response, range) {
+  const match = range ? /^bytes=(\\d*)-(\\d*)$/.exec(range.trim()) : null;
+  if (!match || (!match[1] && !match[2])) {
+    return response;
+  }
+  const blob = await response.blob();
+  const size = blob.size;
+  let start;
+  let end;
+  if (!match[1]) {
+    start = Math.max(0, size - Number(match[2]));
+    end = size - 1;
+  } else {
+    start = Number(match[1]);
+    end = match[2] ? Math.min(Number(match[2]), size - 1) : size - 1;
+  }
+  if (start >= size || start > end) {
+    return new Response(null, {status: 416, headers: {"Content-Range": "bytes */" + size}});
+  }
+  const headers = new Headers(response.headers);
+  headers.set("Content-Range", "bytes " + start + "-" + end + "/" + size);
+  headers.set("Content-Length", String(end - start + 1));
+  return new Response(blob.slice(start, end + 1), {status: 206, statusText: "Partial Content", headers: headers});
+}
+"""
+
+
+def get_precache_list(files):
+    """
+    Choose the files of a bundle the service worker caches on install: the app shell and its icons.
+
+    Args:
+        files (dict): The entries of the bundle manifest, by relative path.
+
+    Returns:
+        list: The relative URLs to precache.
+    """
+    return sorted(
+        relative_path for relative_path, entry in files.items()
+        if relative_path != SERVICE_WORKER
+        and not relative_path.startswith(PRECACHE_EXCLUDED_PREFIXES)
+        and entry["size"] <= PRECACHE_MAX_BYTES
+    )
+
+
+def render_service_worker(version, files):
+    """
+    Render the service worker of a bundle.
+
+    Args:
+        version (str): The version of the bundle. A new version replaces the caches of the previous one.
+        files (dict): The entries of the bundle manifest, by relative path.
+
+    Returns:
+        str: The JavaScript source of the service worker.
+    """
+    return _TEMPLATE % {
+        "version": json.dumps(version),
+        "precache": json.dumps(get_precache_list(files), indent=2),
+        "download_paths": json.dumps(list(DOWNLOAD_PATHS)),
+    }
+
+
+def add_registration(html):
+    """
+    Add the registration of the service worker to index.html, unless it is already there.
+
+    Args:
+        html (str): The content of index.html.
+
+    Returns:
+        str: The updated content.
+    """
+    if REGISTRATION_SNIPPET in html:
+        return html
+    position = html.lower().rfind("</body>")
+    if position == -1:
+        return html + REGISTRATION_SNIPPET
+    return html[:position] + REGISTRATION_SNIPPET + html[position:]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The side server runs next to the Flet app (port 5010) for the endpoints Flet cannot serve itself
+DEFAULT_HOST = os.environ.get("SIDE_SERVER_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("SIDE_SERVER_PORT", "5011"))
+# The URL browsers reach the side server at, e.g. behind a reverse proxy; None for FRONTEND_HOST:DEFAULT_PORT
+PUBLIC_URL = os.environ.get("SIDE_SERVER_PUBLIC_URL")
+
+_routes = []  # (method, path prefix, handler), longest prefixes first
+
+
+def register_route(method, prefix, handler):
+    """
+    Register a handler for the requests whose path starts with a prefix.
+
+    Args:
+        method (str): The HTTP method, e.g. "GET". GET handlers also receive HEAD requests.
+        prefix (str): The path prefix, e.g. "/metrics".
+        handler (callable): Called with the BaseHTTPRequestHandler of the request and the rest of the path after
+            the prefix. It is responsible for sending the whole response.
+    """
+    _routes.append((method, prefix, handler))
+    _routes.sort(key=lambda route: len(route[1]), reverse=True)
+
+
+class SideRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ytm-offline-frontend"
+    disable_nagle_algorithm = True  # Headers and file bodies are written separately, avoid delayed ACK stalls
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _dispatch(self, method):
+        path = self.path.split("?", 1)[0]
+        for route_method, prefix, handler in _routes:
+            if route_method == method and path.startswith(prefix):
+                try:
+                    handler(self, path[len(prefix):])
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                except Exception:
+                    traceback.print_exc()
+                    self.close_connection = True
+                return
+        self.send_plain(404, "Not Found")
+
+    def send_plain(self, status, text, headers=None):
+        """
+        Send a complete text/plain response.
+
+        Args:
+            status (int): The status code.
+            text (str): The body.
+            headers (dict, optional): Extra headers.
+        """
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes and file requests would flood the output
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_side_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Start the process-wide side HTTP server in a background thread, unless it is already running.
+
+    Args:
+        host (str, optional): The address to listen on.
+        port (int, optional): The port to listen on.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), SideRequestHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="side-server", daemon=True).start()
+            print("Side server listening on", host + ":" + str(port))
+        return _server
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+
+def request_key(endpoint, payload):
+    """
+    Build the key identifying a backend request by its endpoint and payload.
+
+    Args:
+        endpoint (str): The endpoint name, e.g. "downloadPlaylist".
+        payload: Any JSON serializable payload.
+
+    Returns:
+        str: The key.
+    """
+    return endpoint + ":" + json.dumps(payload, sort_keys=True)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into a single execution whose result all callers receive.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run func, unless a call with the same key is already in flight, in which case wait for its result.
+
+        Args:
+            key (str): The key of the call.
+            func (callable): The function to run, without arguments.
+
+        Returns:
+            The return value of func. If func raised, every caller gets the exception.
+        """
+        with self._lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self.calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self.calls[key]
+            call.done.set()
+            if call.waiters:
+                print("Coalesced", call.waiters, "concurrent requests into", key)
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Return the process-wide SingleFlight, creating it on first use.
+
+    Returns:
+        SingleFlight: The shared instance.
+    """
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Precompressed, fingerprinted bundle of the published web build, and a server for it.
+
+    flet publish src/FrontEnd.py --web-render html --assets assets
+    python3 src/static_bundle.py build dist dist-bundle
+    python3 src/static_bundle.py serve dist-bundle --port 5010
+
+The files index.html references get a content hash in their name and are served as immutable, so a returning
+browser loads them from its cache without a request. The other files are revalidated with their ETag, which
+costs a 304 without body once cached. Compressible files are stored gzipped (and brotli compressed when the
+brotli package is installed) next to the original, and the smallest encoding the browser accepts is sent.
+The bundle also gets a generated service worker (see service_worker), which renders the app offline.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from urllib.parse import unquote, urlsplit
+
+from file_server import is_not_modified, send_file_body
+from service_worker import SERVICE_WORKER, add_registration, render_service_worker
+from side_server import register_route, start_side_server
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Only the gzip variants are built
+
+BUNDLE_MANIFEST = "bundle-manifest.json"
+INDEX = "index.html"
+
+# Only worth compressing text-like files; images, fonts in woff2 and archives are compressed already
+COMPRESSIBLE_EXTENSIONS = (".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".wasm",
+                           ".ttf", ".otf", ".ico", ".frag")
+# A variant is only kept when it saves at least this share of the bytes
+MIN_SAVING = 0.1
+
+# Workers and manifests must keep a stable URL to be found by the browser
+NEVER_FINGERPRINTED = re.compile(r"(^|/)(manifest\.json|[^/]*service_worker[^/]*\.js|sw\.js)$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Encodings in order of preference, with the suffix of their variant file
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_REFERENCE = re.compile(r"""((?:src|href)\s*=\s*["'])([^"'#?]+)([^"']*["'])""")
+
+mimetypes.add_type("application/wasm", ".wasm")
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("text/javascript", ".mjs")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def add_fingerprint(relative_path, file_hash):
+    head, tail = posix_split(relative_path)
+    stem, dot, extension = tail.partition(".")
+    return head + stem + "." + file_hash[:10] + dot + extension
+
+
+def posix_split(relative_path):
+    head, _, tail = relative_path.rpartition("/")
+    return (head + "/" if head else ""), tail
+
+
+def list_files(directory):
+    for root, _, file_names in os.walk(directory):
+        for file_name in sorted(file_names):
+            path = os.path.join(root, file_name)
+            yield os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def find_index_references(html, files):
+    """
+    Find the bundle files referenced by the src and href attributes of index.html.
+
+    Args:
+        html (str): The content of index.html.
+        files (set): The relative paths of the bundle files.
+
+    Returns:
+        set: The referenced relative paths.
+    """
+    references = set()
+    for _, url, _ in _REFERENCE.findall(html):
+        if urlsplit(url).scheme or url.startswith("//"):
+            continue
+        path = unquote(url).lstrip("/")
+        if path.startswith("./"):
+            path = path[2:]
+        if path in files:
+            references.add(path)
+    return references
+
+
+def compress_variants(path):
+    """
+    Write the gzip and brotli variants of a file, keeping only those that are worth it.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        dict: The size of every written variant, by encoding.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(data, quality=11)
+
+    variants = {}
+    for encoding, suffix in ENCODINGS:
+        if encoding in compressed and len(compressed[encoding]) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed[encoding])
+            variants[encoding] = len(compressed[encoding])
+    return variants
+
+
+def build_bundle(source_dir, output_dir):
+    """
+    Build the precompressed, fingerprinted bundle of a published web build.
+
+    Args:
+        source_dir (str): The output directory of flet publish.
+        output_dir (str): The directory to write the bundle to. A previous bundle there is replaced.
+
+    Returns:
+        dict: The bundle manifest, also written to BUNDLE_MANIFEST in output_dir.
+    """
+    if os.path.exists(output_dir):
+        if not os.path.exists(os.path.join(output_dir, BUNDLE_MANIFEST)):
+            raise ValueError(output_dir + " exists and is not a bundle, refusing to replace it")
+        shutil.rmtree(output_dir)
+
+    files = {relative_path: hash_file(os.path.join(source_dir, relative_path))
+             for relative_path in list_files(source_dir)}
+
+    index_path = os.path.join(source_dir, INDEX)
+    html = None
+    fingerprinted = {}
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            html = f.read()
+        fingerprinted = {
+            relative_path: add_fingerprint(relative_path, files[relative_path])
+            for relative_path in find_index_references(html, set(files))
+            if relative_path != INDEX and not NEVER_FINGERPRINTED.search(relative_path)
+        }
+
+        def replace_reference(match):
+            path = unquote(match.group(2)).lstrip("/")
+            path = path[2:] if path.startswith("./") else path
+            if path not in fingerprinted:
+                return match.group(0)
+            return match.group(1) + match.group(2)[:len(match.group(2)) - len(path)] + fingerprinted[path] + \
+                match.group(3)
+
+        html = add_registration(_REFERENCE.sub(replace_reference, html))
+
+    entries = {}
+    for relative_path, file_hash in files.items():
+        if relative_path == SERVICE_WORKER:
+            continue  # Replaced by the generated service worker
+        target = fingerprinted.get(relative_path, relative_path)
+        target_path = os.path.join(output_dir, *target.split("/"))
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if relative_path == INDEX and html is not None:
+            with open(target_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            file_hash = hash_file(target_path)
+        else:
+            shutil.copyfile(os.path.join(source_dir, relative_path), target_path)
+
+        entries[target] = {
+            "hash": file_hash,
+            "size": os.path.getsize(target_path),
+            "immutable": relative_path in fingerprinted,
+            "encodings": compress_variants(target_path) if target.endswith(COMPRESSIBLE_EXTENSIONS) else {},
+        }
+
+    version = hashlib.sha256("".join(sorted(entry["hash"] for entry in entries.values())).encode("utf-8"))
+    manifest = {
+        # Changes with the content of any file, so caches keyed by it are dropped by the next build
+        "version": version.hexdigest()[:16],
+        "files": entries,
+        "aliases": fingerprinted,
+    }
+
+    service_worker_path = os.path.join(output_dir, SERVICE_WORKER)
+    with open(service_worker_path, "w", encoding="utf-8") as f:
+        f.write(render_service_worker(manifest["version"], entries))
+    entries[SERVICE_WORKER] = {
+        "hash": hash_file(service_worker_path),
+        "size": os.path.getsize(service_worker_path),
+        "immutable": False,
+        "encodings": compress_variants(service_worker_path),
+    }
+    with open(os.path.join(output_dir, BUNDLE_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Negotiate the content encoding of a response.
+
+    Args:
+        accept_encoding (str or None): The Accept-Encoding header of the request.
+        available (dict): The encodings with a variant of the file.
+
+    Returns:
+        str or None: The encoding to send, None for the file as is.
+    """
+    if not accept_encoding or not available:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match is not None:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding, _ in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class StaticBundle:
+    """
+    Serve a bundle built by build_bundle, with negotiated content encoding and cache headers.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): The bundle directory.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, BUNDLE_MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.files = self.manifest["files"]
+        self.aliases = self.manifest["aliases"]
+
+    def resolve(self, path):
+        path = unquote(path).lstrip("/") or INDEX
+        if path in self.files:
+            return path, self.files[path]["immutable"]
+        if path in self.aliases:
+            # An old or hard coded name of a fingerprinted file: the content behind it changes between builds
+            return self.aliases[path], False
+        if "." not in posix_split(path)[1]:
+            # A route of the single page app, e.g. /audio
+            return INDEX, False
+        return None, False
+
+    def handle(self, request, path):
+        """
+        Side server handler for the bundle.
+
+        Args:
+            request (BaseHTTPRequestHandler): The request.
+            path (str): The path of the request.
+        """
+        relative_path, immutable = self.resolve(path)
+        if relative_path is None:
+            request.send_plain(404, "Not Found")
+            return
+
+        entry = self.files[relative_path]
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"), entry["encodings"])
+        file_path = os.path.join(self.directory, *relative_path.split("/"))
+        etag = "\"" + entry["hash"][:32] + "\""
+        if encoding is not None:
+            file_path += dict(ENCODINGS)[encoding]
+            etag = etag[:-1] + "-" + encoding + "\""
+
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        }
+        if entry["encodings"]:
+            headers["Vary"] = "Accept-Encoding"
+        if is_not_modified(request, etag, None):
+            request.send_response(304)
+            for name, value in headers.items():
+                request.send_header(name, value)
+            request.end_headers()
+            return
+
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            request.send_response(200)
+            request.send_header("Content-Type", mimetypes.guess_type(relative_path)[0] or "application/octet-stream")
+            request.send_header("Content-Length", str(size))
+            if encoding is not None:
+                request.send_header("Content-Encoding", encoding)
+            for name, value in headers.items():
+                request.send_header(name, value)
+            request.end_headers()
+            if request.command != "HEAD":
+                send_file_body(request, f, 0, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or serve the precompressed bundle of the web build.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a bundle from the output of flet publish")
+    build.add_argument("source", help="the output directory of flet publish, e.g. dist")
+    build.add_argument("output", help="the bundle directory to write, e.g. dist-bundle")
+    serve = commands.add_parser("serve", help="serve a bundle")
+    serve.add_argument("directory", help="the bundle directory")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=5010)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_bundle(args.source, args.output)
+        compressed = sum(1 for entry in manifest["files"].values() if entry["encodings"])
+        print("Bundle", manifest["version"], "written to", args.output + ":", len(manifest["files"]), "files,",
+              len(manifest["aliases"]), "fingerprinted,", compressed, "precompressed",
+              "" if brotli is not None else "(gzip only, install brotli for .br variants)")
+    else:
+        register_route("GET", "/", StaticBundle(args.directory).handle)
+        start_side_server(args.host, args.port)
+        print("Serving", args.directory)
+        threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+# Maximum number of times per second the upload progress is sent to the client
+DEFAULT_MAX_FPS = 5
+
+# Weight of the newest sample in the smoothed transfer rate
+RATE_SMOOTHING = 0.3
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+class UploadProgressAggregator:
+    """
+    Collect the progress events of every file of an upload batch and send them to the client in a single
+    page.update() at most max_fps times per second, along with an aggregate transfer rate and ETA.
+    """
+
+    def __init__(self, page, scheduler, owner, max_fps=DEFAULT_MAX_FPS):
+        """
+        Args:
+            page (Page): The page of the session.
+            scheduler (Scheduler): The scheduler running the delayed flushes.
+            owner (object): The owner of the delayed flushes on the scheduler, whose calls the session cancels when
+                it ends.
+            max_fps (int, optional): The maximum number of flushes per second.
+        """
+        self.page = page
+        self.scheduler = scheduler
+        self.owner = owner
+        self.interval = 1 / max_fps
+        self.rings = {}
+        self.sizes = {}
+        self.pending = {}
+        self.summary_text = None
+        self.done_bytes = 0
+        self.rate = None
+        self.last_flush = 0
+        self.last_sample = None
+        self.scheduled_flush = None
+        self._lock = threading.Lock()
+
+    def reset(self, rings, sizes, summary_text):
+        """
+        Start following a new batch of files.
+
+        Args:
+            rings (dict): The ProgressRing of every file name.
+            sizes (dict): The size in bytes of every file name.
+            summary_text (Text): The Text showing the aggregate rate and ETA.
+        """
+        with self._lock:
+            self.rings = dict(rings)
+            self.sizes = dict(sizes)
+            self.pending.clear()
+            self.summary_text = summary_text
+            self.done_bytes = 0
+            self.rate = None
+            self.last_sample = None
+            if summary_text is not None:
+                summary_text.value = ""
+
+    def record(self, file_name, progress):
+        """
+        Record the progress of a file. The client sees it on the next flush.
+
+        Args:
+            file_name (str): The name of the file.
+            progress (float): The progress of the file, between 0 and 1.
+        """
+        with self._lock:
+            self.pending[file_name] = progress
+            # A flush cancelled with the calls of the session (e.g. on a disconnect) no longer counts as pending
+            if self.scheduled_flush is not None and not self.scheduled_flush.cancelled:
+                return
+            delay = self.last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                # Coalesce every event until then into a single trailing flush
+                self.scheduled_flush = self.scheduler.call_later(delay, self.flush, owner=self.owner)
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            self.scheduled_flush = None
+            self.last_flush = time.monotonic()
+            for file_name, progress in self.pending.items():
+                ring = self.rings.get(file_name)
+                if ring is not None:
+                    ring.value = progress
+            self.pending.clear()
+            self._update_summary()
+        self.page.update()
+
+    def _update_summary(self):
+        if self.summary_text is None or not self.sizes:
+            return
+
+        total = sum(self.sizes.values())
+        done = sum(
+            (ring.value or 0) * self.sizes.get(file_name, 0) for file_name, ring in self.rings.items()
+        )
+        now = time.monotonic()
+        if self.last_sample is not None and now > self.last_sample[0]:
+            rate = (done - self.last_sample[1]) / (now - self.last_sample[0])
+            self.rate = rate if self.rate is None else RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * self.rate
+        self.last_sample = (now, done)
+
+        text = format_bytes(done) + " / " + format_bytes(total)
+        if self.rate:
+            text += " - " + format_bytes(self.rate) + "/s"
+            if done < total:
+                text += " - ETA " + format_duration((total - done) / self.rate)
+        self.summary_text.value = text
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import uuid as uuid
+from contextlib import contextmanager
+
+from metrics import TRANSFERRED_BYTES
+
+UPLOADS_DIR = "assets/uploads"
+
+# Size of the pieces a download is written in; peak memory per download stays at about this much
+CHUNK_SIZE = 64 * 1024
+
+# Partially written files carry this prefix until they are renamed into place
+TEMP_PREFIX = ".part-"
+
+
+_pins = {}
+_pins_lock = threading.Lock()
+
+_file_listeners = []
+
+
+def get_upload_path(file_name):
+    return os.path.join(UPLOADS_DIR, file_name)
+
+
+def pin(file_name):
+    """
+    Mark a file of assets/uploads as in use, so the janitor does not delete it.
+
+    Args:
+        file_name (str): The file name inside assets/uploads.
+    """
+    with _pins_lock:
+        _pins[file_name] = _pins.get(file_name, 0) + 1
+
+
+def unpin(file_name):
+    with _pins_lock:
+        count = _pins.get(file_name, 0) - 1
+        if count > 0:
+            _pins[file_name] = count
+        else:
+            _pins.pop(file_name, None)
+
+
+def is_pinned(file_name):
+    with _pins_lock:
+        return file_name in _pins
+
+
+def add_file_listener(listener):
+    """
+    Register a listener of the files written into and removed from assets/uploads.
+
+    Args:
+        listener (callable): Called with (file name, size, mtime) for every written file, and with
+            (file name, None, None) for every removed one.
+    """
+    _file_listeners.append(listener)
+
+
+def notify_saved(file_name):
+    """
+    Tell the file listeners that a file was written into assets/uploads.
+
+    Args:
+        file_name (str): The file name inside assets/uploads.
+    """
+    try:
+        stat = os.stat(get_upload_path(file_name))
+    except FileNotFoundError:
+        return
+    for listener in _file_listeners:
+        listener(file_name, stat.st_size, stat.st_mtime)
+
+
+def notify_removed(file_name):
+    for listener in _file_listeners:
+        listener(file_name, None, None)
+
+
+@contextmanager
+def pinned(file_name):
+    """
+    Keep a file of assets/uploads pinned for the duration of a with block.
+
+    Args:
+        file_name (str): The file name inside assets/uploads.
+    """
+    pin(file_name)
+    try:
+        yield get_upload_path(file_name)
+    finally:
+        unpin(file_name)
+
+
+def save_stream(chunks, file_name=None, progress=None, digest=None):
+    """
+    Write an iterable of byte chunks into assets/uploads atomically.
+
+    The chunks go to a temporary file in the same directory, which is renamed into place once complete, so a
+    reader never sees a half-written file.
+
+    Args:
+        chunks (iterable): The byte chunks to write.
+        file_name (str, optional): The final file name. A uuid4 is used when not given.
+        progress (callable, optional): Called with the number of bytes written so far after every chunk.
+        digest (hashlib object, optional): Updated with every chunk, to hash the file without reading it again.
+
+    Returns:
+        str: The name of the written file inside assets/uploads.
+    """
+    if file_name is None:
+        file_name = str(uuid.uuid4())
+
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=UPLOADS_DIR)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as s:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                s.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress(written)
+        os.replace(temp_path, get_upload_path(file_name))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    notify_saved(file_name)
+    return file_name
+
+
+def save_response(response, file_name=None, progress=None, digest=None):
+    """
+    Stream the body of a requests response into assets/uploads.
+
+    Args:
+        response (Response): A response obtained with stream=True.
+        file_name (str, optional): The final file name. A uuid4 is used when not given.
+        progress (callable, optional): Called with (bytes written, total bytes or None) after every chunk.
+        digest (hashlib object, optional): Updated with every chunk of the body.
+
+    Returns:
+        str: The name of the written file inside assets/uploads.
+    """
+    total = response.headers.get("Content-Length")
+    total = int(total) if total is not None and total.isdigit() else None
+
+    def on_chunk(written):
+        progress(written, total)
+
+    try:
+        file_name = save_stream(
+            response.iter_content(CHUNK_SIZE),
+            file_name,
+            on_chunk if progress is not None else None,
+            digest
+        )
+    finally:
+        response.close()
+    TRANSFERRED_BYTES.inc(os.path.getsize(get_upload_path(file_name)), "backend_download")
+    return file_name
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+from urllib.parse import urlparse, parse_qs
+
+YOUTUBE_HOSTS = (
+    "youtube.com",
+    "www.youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+    "youtu.be",
+    "www.youtu.be",
+)
+
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+PLAYLIST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{2,64}$")
+
+
+def _parse(link):
+    if link is None:
+        return None
+    link = link.strip()
+    if "://" not in link:
+        link = "https://" + link
+    parsed = urlparse(link)
+    if parsed.hostname not in YOUTUBE_HOSTS:
+        return None
+    return parsed
+
+
+def get_video_id(link):
+    """
+    Extract the video id of a YouTube or YouTube Music URL.
+
+    Args:
+        link (str): The URL, e.g. "https://www.youtube.com/watch?v=dQw4w9WgXcQ" or "https://youtu.be/dQw4w9WgXcQ".
+
+    Returns:
+        str or None: The video id, or None if the URL is not a YouTube video URL.
+    """
+    parsed = _parse(link)
+    if parsed is None:
+        return None
+
+    path_parts = [part for part in parsed.path.split("/") if part]
+    if parsed.hostname.endswith("youtu.be"):
+        video_id = path_parts[0] if path_parts else None
+    elif path_parts[:1] in (["shorts"], ["embed"], ["live"]) and len(path_parts) > 1:
+        video_id = path_parts[1]
+    else:
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+
+    if video_id is None or not VIDEO_ID_PATTERN.match(video_id):
+        return None
+    return video_id
+
+
+def get_playlist_id(link):
+    """
+    Extract the playlist id of a YouTube or YouTube Music URL.
+
+    Args:
+        link (str): The URL, e.g. "https://www.youtube.com/playlist?list=PL...".
+
+    Returns:
+        str or None: The playlist id, or None if the URL is not a YouTube playlist URL.
+    """
+    parsed = _parse(link)
+    if parsed is None:
+        return None
+
+    playlist_id = parse_qs(parsed.query).get("list", [None])[0]
+    if playlist_id is None or not PLAYLIST_ID_PATTERN.match(playlist_id):
+        return None
+    return playlist_id
+
+
+def parse_url_list(text, id_func):
+    """
+    Split a multi-line list of URLs, skipping blank lines and duplicates and setting invalid URLs apart.
+
+    Two URLs are duplicates when id_func extracts the same id from them, e.g. a youtu.be and a youtube.com link
+    to the same video.
+
+    Args:
+        text (str): One URL per line.
+        id_func (callable): get_video_id or get_playlist_id.
+
+    Returns:
+        tuple: The list of valid URLs, in their original order, and the list of invalid ones.
+    """
+    valid = []
+    invalid = []
+    seen = set()
+    for line in (text or "").splitlines():
+        link = line.strip()
+        if not link:
+            continue
+        link_id = id_func(link)
+        if link_id is None:
+            if link not in invalid:
+                invalid.append(link)
+        elif link_id not in seen:
+            seen.add(link_id)
+            valid.append(link)
+    return valid, invalid
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import posixpath
+import zipfile
+from contextlib import contextmanager
+
+from backend_client import UPLOAD_RECEIVED_AUDIO
+
+# Audio formats accepted inside a playlist archive
+AUDIO_EXTENSIONS = ("mp3", "m4a", "aac", "flac", "ogg", "opus", "wav")
+
+MAX_ENTRY_BYTES = int(os.environ.get("ZIP_MAX_ENTRY_BYTES", str(500 * 1024 ** 2)))
+MAX_ENTRIES = int(os.environ.get("ZIP_MAX_ENTRIES", "1000"))
+# Audio barely compresses, a higher ratio means a forged or zip bomb entry
+MAX_COMPRESSION_RATIO = 20
+
+HEADER_SIZE = 12
+
+
+def _has_audio_signature(header, extension):
+    if extension == "mp3":
+        # An ID3 tag, or directly an MPEG frame sync
+        return header.startswith(b"ID3") or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0)
+    if extension == "aac":
+        return len(header) > 1 and header[0] == 0xFF and header[1] & 0xF0 == 0xF0
+    if extension == "m4a":
+        return header[4:8] == b"ftyp"
+    if extension == "flac":
+        return header.startswith(b"fLaC") or header.startswith(b"ID3")
+    if extension in ("ogg", "opus"):
+        return header.startswith(b"OggS")
+    if extension == "wav":
+        return header.startswith(b"RIFF") and header[8:12] == b"WAVE"
+    return False
+
+
+def get_track_name(entry_name):
+    return posixpath.basename(entry_name)
+
+
+def list_tracks(zip_path):
+    """
+    List the audio entries of a playlist archive, validating them from the central directory only.
+
+    Directories and hidden or macOS metadata entries are skipped silently; other invalid entries are rejected.
+
+    Args:
+        zip_path (str): The path of the archive.
+
+    Returns:
+        tuple: The list of valid ZipInfo entries and the list of (entry name, reason) of the rejected ones.
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a zip archive.
+    """
+    tracks = []
+    rejected = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for entry in archive.infolist():
+            name = get_track_name(entry.filename)
+            if entry.is_dir() or not name or name.startswith(".") or entry.filename.startswith("__MACOSX/"):
+                continue
+
+            extension = name.rpartition(".")[2].lower()
+            if extension not in AUDIO_EXTENSIONS:
+                rejected.append((entry.filename, "not an audio file"))
+            elif entry.flag_bits & 0x1:
+                rejected.append((entry.filename, "encrypted"))
+            elif entry.file_size == 0:
+                rejected.append((entry.filename, "empty"))
+            elif entry.file_size > MAX_ENTRY_BYTES:
+                rejected.append((entry.filename, "larger than " + str(MAX_ENTRY_BYTES) + " bytes"))
+            elif entry.file_size > MAX_COMPRESSION_RATIO * max(entry.compress_size, 1):
+                rejected.append((entry.filename, "suspicious compression ratio"))
+            elif len(tracks) >= MAX_ENTRIES:
+                rejected.append((entry.filename, "more than " + str(MAX_ENTRIES) + " tracks"))
+            else:
+                tracks.append(entry)
+    return tracks, rejected
+
+
+@contextmanager
+def open_track(zip_path, entry_name):
+    """
+    Open one entry of a playlist archive for streaming, after checking that its content looks like audio.
+
+    Every call opens the archive on its own, so entries can be read from several threads at once.
+
+    Args:
+        zip_path (str): The path of the archive.
+        entry_name (str): The name of the entry inside the archive.
+
+    Yields:
+        tuple: The binary file object decompressing the entry, positioned at its start, and its size in bytes.
+
+    Raises:
+        ValueError: If the content of the entry does not match its audio format.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        entry = archive.getinfo(entry_name)
+        with archive.open(entry) as f:
+            extension = entry.filename.rpartition(".")[2].lower()
+            if not _has_audio_signature(f.read(HEADER_SIZE), extension):
+                raise ValueError("not a valid " + extension + " file")
+            f.seek(0)
+            yield f, entry.file_size
+
+
+def upload_track(backend, zip_path, entry_name):
+    """
+    Stream one track of a playlist archive to the backend.
+
+    Args:
+        backend (BackendPool): The backends to send the track to.
+        zip_path (str): The path of the archive.
+        entry_name (str): The name of the track inside the archive.
+
+    Returns:
+        Response: The response of the backend.
+
+    Raises:
+        RuntimeError: If the backend did not accept the track.
+    """
+    with open_track(zip_path, entry_name) as (f, size):
+        response = backend.post_file_stream(
+            UPLOAD_RECEIVED_AUDIO,
+            get_track_name(entry_name),
+            get_track_name(entry_name),
+            f,
+            size
+        )
+    if response is None:
+        raise RuntimeError("the backend did not accept the track")
+    return response
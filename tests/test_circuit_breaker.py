@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake_clock)
+    return fake_clock
+
+
+def create_breaker(health_check=lambda: True):
+    return CircuitBreaker(health_check, failure_rate=0.5, window_size=4, min_calls=4, open_seconds=10)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = create_breaker()
+    for _ in range(3):
+        breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_opens_at_failure_rate_and_fails_fast(clock):
+    breaker = create_breaker()
+    for failed in (False, True, False, True):
+        breaker.record(failed)
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    clock.now += 9
+    assert not breaker.allow()
+
+
+def test_stays_closed_under_failure_rate(clock):
+    breaker = create_breaker()
+    for failed in (False, False, False, True, False, False):
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+
+
+def test_ignores_outcomes_while_open(clock):
+    breaker = create_breaker()
+    for _ in range(4):
+        breaker.record(True)
+    results = list(breaker.results)
+    breaker.record(False)
+    assert list(breaker.results) == results
+    assert breaker.state == OPEN
+
+
+def test_healthy_probe_closes_the_circuit(clock):
+    probes = []
+    breaker = create_breaker(lambda: probes.append(True) or True)
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 10
+    assert breaker.allow()
+    assert probes == [True]
+    assert breaker.state == CLOSED
+    assert not breaker.results
+    assert breaker.allow()
+    assert probes == [True]  # A closed circuit does not probe
+
+
+@pytest.mark.parametrize("health_check", [lambda: False, lambda: 1 / 0], ids=["unhealthy", "raising"])
+def test_failed_probe_reopens_for_another_period(clock, health_check):
+    breaker = create_breaker(health_check)
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 10
+    assert not breaker.allow()
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+    clock.now += 5
+    assert not breaker.allow()
+
+
+def test_only_one_caller_probes(clock):
+    probing = threading.Event()
+    release = threading.Event()
+
+    def health_check():
+        probing.set()
+        return release.wait(5)
+
+    breaker = create_breaker(health_check)
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 10
+
+    results = []
+    prober = threading.Thread(target=lambda: results.append(breaker.allow()))
+    prober.start()
+    assert probing.wait(5)
+    # Half-open: the other callers keep failing fast while the probe runs
+    assert not breaker.allow()
+    release.set()
+    prober.join(5)
+    assert results == [True]
+    assert breaker.state == CLOSED
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from file_server import parse_range
+
+
+@pytest.mark.parametrize("header, size, expected", [
+    ("bytes=0-99", 1000, (0, 99)),
+    ("bytes=500-", 1000, (500, 999)),
+    ("bytes=900-2000", 1000, (900, 999)),
+    ("bytes=999-999", 1000, (999, 999)),
+    (" bytes=0-0 ", 1000, (0, 0)),
+    # Suffix ranges: the last bytes of the file
+    ("bytes=-100", 1000, (900, 999)),
+    ("bytes=-5000", 1000, (0, 999)),
+])
+def test_satisfiable_ranges(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=5000-6000", 1000),
+    ("bytes=5-3", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-10", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-1,5-6",  # Several ranges are answered with the whole file
+    "bytes=-",
+    "items=0-1",
+    "bytes=a-b",
+    "",
+])
+def test_ignored_headers(header):
+    assert parse_range(header, 1000) is None
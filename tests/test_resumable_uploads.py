@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+import resumable_uploads
+from resumable_client import upload_file
+from resumable_uploads import (
+    CHECKSUM_HEADER,
+    TOKEN_HEADER,
+    UPLOADS_PREFIX,
+    ResumableUploads,
+    _protocol_handler,
+    issue_upload_token,
+)
+from side_server import SideRequestHandler, register_route
+from uploads_storage import get_upload_path
+
+CHUNK_SIZE = 4
+
+# The routes of the side server are process-wide: they are registered once and call the uploads of the current test
+_current = {}
+
+
+def _route(method_name):
+    return _protocol_handler(lambda request, path: getattr(_current["uploads"], method_name)(request, path))
+
+
+register_route("POST", UPLOADS_PREFIX, _route("handle_post"))
+register_route("PUT", UPLOADS_PREFIX, _route("handle_put"))
+register_route("GET", UPLOADS_PREFIX, _route("handle_get"))
+
+
+@pytest.fixture
+def forwarded():
+    return []
+
+
+@pytest.fixture
+def base_url(tmp_path, monkeypatch, forwarded):
+    # The sessions and assets/uploads directories are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    _current["uploads"] = ResumableUploads(lambda *names: forwarded.append(names), chunk_size=CHUNK_SIZE)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SideRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield "http://127.0.0.1:" + str(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def start_upload(base_url, file_name, size, token=None):
+    return requests.post(
+        base_url + UPLOADS_PREFIX,
+        json={"file_name": file_name, "size": size},
+        headers={TOKEN_HEADER: issue_upload_token() if token is None else token}
+    )
+
+
+def put_chunk(base_url, upload_id, index, chunk, checksum=None):
+    return requests.put(
+        base_url + UPLOADS_PREFIX + "/" + upload_id + "/" + str(index),
+        data=chunk,
+        headers={CHECKSUM_HEADER: checksum or hashlib.sha256(chunk).hexdigest()}
+    )
+
+
+def wait_for_state(base_url, upload_id, state):
+    deadline = time.monotonic() + 5
+    while True:
+        upload = requests.get(base_url + UPLOADS_PREFIX + "/" + upload_id).json()
+        if upload["state"] == state or time.monotonic() > deadline:
+            return upload
+        time.sleep(0.02)
+
+
+@pytest.mark.parametrize("token", ["", "garbage", "9999999999.deadbeef", issue_upload_token(max_age=-10)],
+                         ids=["missing", "malformed", "forged", "expired"])
+def test_start_requires_a_valid_token(base_url, token):
+    response = start_upload(base_url, "song.mp3", 10, token)
+    assert response.status_code == 401
+    assert TOKEN_HEADER in response.json()["error"]
+
+
+def test_start_describes_the_chunks(base_url):
+    response = start_upload(base_url, "song.mp3", 10)
+    assert response.status_code == 201
+    upload = response.json()
+    assert response.headers["Location"] == UPLOADS_PREFIX + "/" + upload["upload_id"]
+    assert upload["chunk_count"] == 3
+    assert upload["missing"] == [0, 1, 2]
+
+
+@pytest.mark.parametrize("path", ["/not-an-id", "/" + "0" * 32])
+def test_unknown_upload_ids_are_rejected(base_url, path):
+    assert requests.get(base_url + UPLOADS_PREFIX + path).status_code == 404
+    assert requests.post(base_url + UPLOADS_PREFIX + path + "/complete").status_code == 404
+    response = requests.put(base_url + UPLOADS_PREFIX + path + "/0", data=b"abcd", headers={CHECKSUM_HEADER: "00"})
+    assert response.status_code == 404
+
+
+def test_bad_chunks_are_rejected(base_url):
+    upload_id = start_upload(base_url, "song.mp3", 10).json()["upload_id"]
+    assert put_chunk(base_url, upload_id, 0, b"abcd", checksum="0" * 64).status_code == 422
+    assert put_chunk(base_url, upload_id, 0, b"abc").status_code == 400
+    assert put_chunk(base_url, upload_id, 3, b"ab").status_code == 416
+    assert requests.get(base_url + UPLOADS_PREFIX + "/" + upload_id).json()["missing"] == [0, 1, 2]
+
+
+def test_complete_requires_every_chunk(base_url):
+    upload_id = start_upload(base_url, "song.mp3", 10).json()["upload_id"]
+    assert put_chunk(base_url, upload_id, 0, b"abcd").status_code == 201
+    response = requests.post(base_url + UPLOADS_PREFIX + "/" + upload_id + "/complete")
+    assert response.status_code == 409
+
+
+def test_interrupted_upload_resumes_with_the_missing_chunks(base_url, tmp_path, forwarded):
+    content = b"0123456789abcdefghij!"
+    path = tmp_path / "song.mp3"
+    path.write_bytes(content)
+    upload_id = start_upload(base_url, "song.mp3", len(content)).json()["upload_id"]
+    # Interrupted after the first two chunks
+    assert put_chunk(base_url, upload_id, 0, content[:4]).status_code == 201
+    assert put_chunk(base_url, upload_id, 1, content[4:8]).status_code == 201
+    # A chunk sent again is acknowledged without being written
+    assert put_chunk(base_url, upload_id, 1, content[4:8]).status_code == 200
+
+    sent = []
+
+    def record_request(response, *args, **kwargs):
+        sent.append(response.request.method + " " + response.request.path_url)
+
+    session = requests.Session()
+    session.hooks["response"].append(record_request)
+    upload_file(base_url, str(path), upload_id, session=session)
+
+    chunk_path = UPLOADS_PREFIX + "/" + upload_id + "/"
+    assert [request for request in sent if request.startswith("PUT")] == [
+        "PUT " + chunk_path + str(index) for index in range(2, 6)
+    ]
+    upload = wait_for_state(base_url, upload_id, "done")
+    assert upload["state"] == "done"
+    stored_name = upload_id + "-song.mp3"
+    assert forwarded == [(stored_name, "song.mp3")]
+    with open(get_upload_path(stored_name), "rb") as f:
+        assert f.read() == content
+    assert not os.path.exists(os.path.join(resumable_uploads.SESSIONS_DIR, upload_id + ".data"))
+
+
+def test_upload_survives_a_restart(base_url, forwarded):
+    upload_id = start_upload(base_url, "song.mp3", 6).json()["upload_id"]
+    assert put_chunk(base_url, upload_id, 0, b"abcd").status_code == 201
+    # A new process only knows the upload from its state file
+    _current["uploads"] = ResumableUploads(lambda *names: forwarded.append(names), chunk_size=CHUNK_SIZE)
+    assert requests.get(base_url + UPLOADS_PREFIX + "/" + upload_id).json()["missing"] == [1]
+    assert put_chunk(base_url, upload_id, 1, b"ef").status_code == 201
+    assert requests.post(base_url + UPLOADS_PREFIX + "/" + upload_id + "/complete").status_code == 202
+    assert wait_for_state(base_url, upload_id, "done")["state"] == "done"
+
+
+def test_active_uploads_are_capped(base_url, monkeypatch):
+    monkeypatch.setattr(resumable_uploads, "MAX_ACTIVE_SESSIONS", 2)
+    assert start_upload(base_url, "a.mp3", 4).status_code == 201
+    assert start_upload(base_url, "b.mp3", 4).status_code == 201
+    assert start_upload(base_url, "c.mp3", 4).status_code == 429
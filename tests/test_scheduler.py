@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def test_calls_run_after_their_delay_in_order():
+    scheduler = Scheduler(max_workers=1)
+    calls = []
+    done = threading.Event()
+    start = time.monotonic()
+    scheduler.call_later(0.2, lambda: calls.append("late") or done.set())
+    scheduler.call_later(0.05, lambda: calls.append("early"))
+    assert done.wait(5)
+    assert calls == ["early", "late"]
+    assert time.monotonic() - start >= 0.2
+
+
+def test_cancel_owner_only_cancels_the_calls_of_that_owner():
+    scheduler = Scheduler()
+    owner, other_owner = object(), object()
+    calls = []
+    done = threading.Event()
+    scheduler.call_later(0.05, lambda: calls.append("owner"), owner=owner)
+    scheduler.call_later(0.05, lambda: calls.append("other"), owner=other_owner)
+    scheduler.call_later(0.1, done.set)
+    scheduler.cancel_owner(owner)
+    assert done.wait(5)
+    assert calls == ["other"]
+
+
+def test_cancelled_call_does_not_run():
+    scheduler = Scheduler()
+    calls = []
+    done = threading.Event()
+    call = scheduler.call_later(0.05, lambda: calls.append(True))
+    scheduler.call_later(0.1, done.set)
+    call.cancel()
+    assert done.wait(5)
+    assert not calls
+
+
+def test_slow_call_does_not_delay_the_others():
+    scheduler = Scheduler(max_workers=2)
+    release = threading.Event()
+    done = threading.Event()
+    scheduler.call_later(0, lambda: release.wait(5))
+    scheduler.call_later(0.05, done.set)
+    assert done.wait(1)
+    release.set()
+
+
+def test_failing_call_does_not_stop_the_scheduler():
+    scheduler = Scheduler()
+    done = threading.Event()
+    scheduler.call_later(0, lambda: 1 / 0)
+    scheduler.call_later(0.05, done.set)
+    assert done.wait(5)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def run_followers(single_flight, key, func, count):
+    """
+    Start count callers of key once a leader is in flight, and wait until they all wait for it.
+    """
+    outcomes = []
+
+    def follow():
+        try:
+            outcomes.append(single_flight.do(key, func))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=follow) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while single_flight.calls[key].waiters < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return threads, outcomes
+
+
+def start_leader(single_flight, key, func):
+    outcomes = []
+
+    def lead():
+        try:
+            outcomes.append(single_flight.do(key, func))
+        except Exception as e:
+            outcomes.append(e)
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while key not in single_flight.calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return thread, outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(True)
+        release.wait(5)
+        return "result"
+
+    leader, leader_outcomes = start_leader(single_flight, "key", func)
+    followers, outcomes = run_followers(single_flight, "key", func, 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [True]
+    assert leader_outcomes + outcomes == ["result"] * 4
+    assert not single_flight.calls
+
+
+def test_error_reaches_every_caller_and_is_not_cached():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    error = ValueError("backend failed")
+
+    def func():
+        release.wait(5)
+        raise error
+
+    leader, leader_outcomes = start_leader(single_flight, "key", func)
+    followers, outcomes = run_followers(single_flight, "key", func, 2)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert leader_outcomes + outcomes == [error] * 3
+    assert not single_flight.calls
+    # The next call runs again instead of getting the old error
+    assert single_flight.do("key", lambda: "retried") == "retried"
+
+
+def test_error_of_a_lone_call_is_raised():
+    with pytest.raises(KeyError):
+        SingleFlight().do("key", lambda: {}["missing"])
+
+
+def test_different_keys_run_separately():
+    single_flight = SingleFlight()
+    assert single_flight.do("a", lambda: 1) == 1
+    assert single_flight.do("b", lambda: 2) == 2
+
+
+def test_request_key_ignores_payload_order():
+    assert request_key("downloadAudio", {"a": 1, "b": 2}) == request_key("downloadAudio", {"b": 2, "a": 1})
+    assert request_key("downloadAudio", {"a": 1}) != request_key("downloadPlaylist", {"a": 1})